@@ -4,8 +4,9 @@ from scripts.game import Game
 from scripts.menu import Menu
 from scripts.GameManager import game_state_manager
 from scripts.editor import EditorMenu
-from scripts.assets import AssetManager
+from scripts.assets import AssetManager, PLAYER_ASSETS
 from scripts.utils import scale_font
+from scripts.dirtyrects import display_updater
 
 class LoadingScreen:
     def __init__(self, display):
@@ -15,7 +16,9 @@ class LoadingScreen:
         self.background = pygame.image.load(MENUBG)
         self.background = pygame.transform.scale(self.background, DISPLAY_SIZE)
         
-    def show(self, text="Loading..."):
+    def show(self, text="Loading...", progress=None):
+        # Keep the window responsive while work happens between calls
+        pygame.event.pump()
         self.display.blit(self.background, (0, 0))
         
         # Create loading text
@@ -29,8 +32,28 @@ class LoadingScreen:
         dots_rect = dots_surface.get_rect(center=(DISPLAY_SIZE[0]//2 + 100, DISPLAY_SIZE[1]//2))
         self.display.blit(dots_surface, dots_rect)
         
+        if progress is not None:
+            bar_width, bar_height = DISPLAY_SIZE[0] // 3, max(6, DISPLAY_SIZE[1] // 90)
+            bar_rect = pygame.Rect(0, 0, bar_width, bar_height)
+            bar_rect.center = (DISPLAY_SIZE[0] // 2, DISPLAY_SIZE[1] // 2 + self.font.get_height())
+            pygame.draw.rect(self.display, (40, 40, 70), bar_rect)
+            filled = bar_rect.copy()
+            filled.width = int(bar_width * max(0.0, min(1.0, progress)))
+            pygame.draw.rect(self.display, (255, 255, 255), filled)
+        
         pygame.display.flip()
 
+    def report(self, text):
+        # Progress callback for loaders reporting (done, total)
+        last_shown = [0]
+        def callback(done, total):
+            now = pygame.time.get_ticks()
+            if done < total and now - last_shown[0] < 33:
+                return
+            last_shown[0] = now
+            self.show(f"{text} {done}/{total}", done / total if total else 1.0)
+        return callback
+
 class Engine:
     def __init__(self):
         pygame.init()
@@ -43,8 +66,11 @@ class Engine:
         loading_screen = LoadingScreen(self.display)
         loading_screen.show("Initializing...")
         
-        # Pre-load all assets during engine initialization
-        self.asset_manager = AssetManager()  
+        # Assets load on first use. Player animations are needed by every map,
+        # so they are decoded here behind the progress bar; map tiles warm up
+        # in the background once a map is picked
+        self.asset_manager = AssetManager()
+        self.asset_manager.load_image_sets(PLAYER_ASSETS, loading_screen.report("Loading player"))
         loading_screen.show("Loading game components...")
         
         # Initialize game components
@@ -78,7 +104,7 @@ class Engine:
                 editor_menu.run()
 
             previous_state = current_state
-            pygame.display.flip()
+            display_updater.present()
 
 
 if __name__ == '__main__':
@@ -1,79 +1,192 @@
-from scripts.utils import load_images, load_sounds, Animation, load_sound
-from scripts.constants import PLAYERS_IMAGE_SIZE,IMGSCALE, FINISHSCALE
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from scripts.utils import (
+    load_images, load_sounds, Animation, load_sound,
+    list_images, decode_image, finish_image
+)
+from scripts.atlas import load_atlas
+from scripts.mapformat import load_map_data
+from scripts.constants import (
+    PLAYERS_IMAGE_SIZE, IMGSCALE, FINISHSCALE, ASSET_LOADER_THREADS,
+    SOUND_VOLUMES, TILEMAP, OFFGRID, TYPE
+)
 import pygame
 
+# name -> (image folder, scale, Animation kwargs or None for a plain frame list)
+IMAGE_ASSETS = {
+    'decor': ('tiles/decor', IMGSCALE, None),
+    'grass': ('tiles/grass', IMGSCALE, None),
+    'stone': ('tiles/stone', IMGSCALE, None),
+    'pinkrock': ('tiles/pinkrock', IMGSCALE, None),
+    'spawners': ('tiles/spawners', IMGSCALE, None),
+    'spikes': ('tiles/spikes', IMGSCALE, None),
+    'finish': ('tiles/finish', FINISHSCALE, None),
+    'finish_animation': ('tiles/finish', FINISHSCALE, {'img_dur': 5, 'loop': True}),
+    'kill': ('tiles/kill', IMGSCALE, None),
+    'player/finish': ('player/finish', PLAYERS_IMAGE_SIZE, {'img_dur': 10, 'loop': False}),
+    'player/run': ('player/run', PLAYERS_IMAGE_SIZE, {'img_dur': 5}),
+    'player/idle': ('player/idle', PLAYERS_IMAGE_SIZE, {'img_dur': 25}),
+    'player/wallslide': ('player/wallslide', PLAYERS_IMAGE_SIZE, {'loop': False}),
+    'player/wallcollide': ('player/wallcollide', PLAYERS_IMAGE_SIZE, {'loop': False}),
+    'player/jump_anticipation': ('player/jump_anticipation', PLAYERS_IMAGE_SIZE, {'img_dur': 2, 'loop': False}),
+    'player/jump_peak': ('player/jump_peak', PLAYERS_IMAGE_SIZE, {'img_dur': 6, 'loop': False}),
+    'player/jump_rising': ('player/jump_rising', PLAYERS_IMAGE_SIZE, {'img_dur': 8, 'loop': False}),
+    'player/jump_landing': ('player/jump_land', PLAYERS_IMAGE_SIZE, {'img_dur': 10, 'loop': False}),
+    'player/jump_falling': ('player/jump_falling', PLAYERS_IMAGE_SIZE, {'img_dur': 4, 'loop': False}),
+    'player/death': ('player/death', (PLAYERS_IMAGE_SIZE[0] * 4, PLAYERS_IMAGE_SIZE[1] * 4), {'img_dur': 2, 'loop': False}),
+}
+
+SOUND_ASSETS = {
+    'land': 'land/land.ogg',
+    'death': 'death/death.ogg',
+    'collide': 'wallcollide/grab.wav',
+    'finish': 'finish/finish.ogg',
+    'jump': 'jump/jump.ogg',
+    'wall_jump_left': 'jump/wall_jump_left.ogg',
+    'wall_jump_right': 'jump/wall_jump_right.ogg',
+}
+
+PLAYER_ASSETS = [name for name in IMAGE_ASSETS if name.startswith('player/')]
+
+# Extra entries a map needs for a tile type besides the one of the same name
+TILE_TYPE_ASSETS = {
+    'finish': ['finish', 'finish_animation'],
+}
+
+
+def assets_for_tile_types(tile_types):
+    names = []
+    for tile_type in tile_types:
+        names.extend(TILE_TYPE_ASSETS.get(tile_type, [tile_type]))
+    return [name for name in names if name in IMAGE_ASSETS]
+
+
+class LazyAssets(dict):
+    # Entries materialize on first access through the owning AssetManager
+    def __init__(self, loader, specs):
+        super().__init__()
+        self.loader = loader
+        self.specs = specs
+
+    def __missing__(self, name):
+        if name not in self.specs:
+            raise KeyError(name)
+        self.loader([name])
+        return dict.__getitem__(self, name)
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or name in self.specs
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
 
 class AssetManager:
     _instance = None
     _assets_loaded = False
-    
-    def __new__(cls):
+
+    def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
-    
+
     def __init__(self):
         if not self._assets_loaded:
-            self.assets = {}
             self.rotated_cache = {}
-            self.load_all_assets()
+            self.atlas = load_atlas()
+            # Decoded frames shared by every entry using the same folder and scale
+            self.frame_sets = {}
+            self.pending = {}
+            self.lock = threading.Lock()
+            self.pool = ThreadPoolExecutor(max_workers=ASSET_LOADER_THREADS)
+            self.assets = LazyAssets(self.load_image_sets, IMAGE_ASSETS)
+            self.sfx = LazyAssets(self.load_sfx, SOUND_ASSETS)
             AssetManager._assets_loaded = True
-    
-    def load_all_assets(self):      
-        self.assets = {          
-            'decor': load_images('tiles/decor', scale=IMGSCALE),
-            'grass': load_images('tiles/grass', scale=IMGSCALE),
-            'stone': load_images('tiles/stone', scale=IMGSCALE),
-            'pinkrock': load_images('tiles/pinkrock', scale=IMGSCALE),
-            'spawners': load_images('tiles/spawners', scale=IMGSCALE),
-            'spikes': load_images('tiles/spikes', scale=IMGSCALE),
-            'finish': load_images('tiles/finish', scale=FINISHSCALE),
-            'finish_animation': Animation(load_images('tiles/finish', scale=FINISHSCALE), img_dur=5, loop=True),
-            'kill': load_images('tiles/kill', scale=IMGSCALE),
-            'player/finish': Animation(load_images('player/finish', scale=PLAYERS_IMAGE_SIZE), img_dur=10, loop=False),
-            'player/run': Animation(load_images('player/run', scale=PLAYERS_IMAGE_SIZE), img_dur=5),
-            'player/idle': Animation(load_images('player/idle', scale=PLAYERS_IMAGE_SIZE), img_dur=25),
-            'player/wallslide': Animation(load_images('player/wallslide', scale=PLAYERS_IMAGE_SIZE), loop=False),
-            'player/wallcollide': Animation(load_images('player/wallcollide', scale=PLAYERS_IMAGE_SIZE), loop=False),
-            'player/jump_anticipation': Animation(
-                load_images('player/jump_anticipation', scale=PLAYERS_IMAGE_SIZE),
-                img_dur=2, loop=False  
-            ),
-            'player/jump_peak': Animation(
-                load_images('player/jump_peak', scale=PLAYERS_IMAGE_SIZE),
-                img_dur=6, loop=False
-            ),
-            'player/jump_rising': Animation(
-                load_images('player/jump_rising', scale=PLAYERS_IMAGE_SIZE),  
-                img_dur=8, loop=False
-            ),
-            'player/jump_landing': Animation(
-                load_images('player/jump_land', scale=PLAYERS_IMAGE_SIZE),
-                img_dur=10, loop=False 
-            ),
-            'player/jump_falling': Animation(
-                load_images('player/jump_falling', scale=PLAYERS_IMAGE_SIZE),
-                img_dur=4, loop=False 
-            ),
-            'player/death': Animation(load_images('player/death', scale=(PLAYERS_IMAGE_SIZE[0]*4, PLAYERS_IMAGE_SIZE[1]*4)), img_dur=2, loop=False),
-        }
-        
-        self.sfx = {
-            'land': load_sound('land/land.ogg', volume=0.02),
-            'death': load_sound('death/death.ogg', volume=0.01),
-            'collide': load_sound('wallcollide/grab.wav', volume=0.01),
-            'finish': load_sound('finish/finish.ogg', volume=0.1),
-            'jump': load_sound('jump/jump.ogg', volume=0.01),
-            'wall_jump_left': load_sound('jump/wall_jump_left.ogg', volume=0.01),
-            'wall_jump_right': load_sound('jump/wall_jump_right.ogg', volume=0.01)  
-        }
+
+    def load_images(self, path, scale=None):
+        # Frames come from the baked atlas when present, otherwise from loose files
+        if self.atlas is not None and path in self.atlas:
+            return self.atlas.frames(path, scale)
+        return load_images(path, scale=scale)
+
+    def _frame_key(self, name):
+        path, scale, _ = IMAGE_ASSETS[name]
+        return path, tuple(scale) if scale else None
+
+    def prefetch(self, names):
+        # Start decoding in the background; nothing blocks until first access
+        with self.lock:
+            for name in names:
+                if name not in IMAGE_ASSETS or dict.__contains__(self.assets, name):
+                    continue
+                key = self._frame_key(name)
+                if key in self.frame_sets or key in self.pending:
+                    continue
+                path, scale = key
+                if self.atlas is not None and path in self.atlas:
+                    continue
+                self.pending[key] = [self.pool.submit(decode_image, file, scale) for file in list_images(path)]
+
+    def prefetch_map(self, map_path):
+        # Scan which tile types a map uses off the main thread, then warm them
+        def scan():
+            map_data = load_map_data(map_path)
+            tile_types = {tile[TYPE].split()[0] for tile in map_data[TILEMAP].values()}
+            tile_types.update(tile[TYPE].split()[0] for tile in map_data[OFFGRID])
+            self.prefetch(assets_for_tile_types(tile_types))
+        return self.pool.submit(scan)
+
+    def load_image_sets(self, names, progress=None):
+        # Task graph: one decode task per file fans out to the pool, each image
+        # set joins once all of its frames are back. Decoding and scaling run on
+        # workers; Surface conversion happens here on the main thread.
+        names = [name for name in names if not dict.__contains__(self.assets, name)]
+        self.prefetch(names)
+
+        with self.lock:
+            keys = {self._frame_key(name) for name in names}
+            waiting = {key: self.pending.pop(key) for key in keys if key in self.pending}
+        for key in keys:
+            if key not in self.frame_sets and key not in waiting:
+                self.frame_sets[key] = self.atlas.frames(*key)
+
+        futures = {future: (key, i) for key, key_futures in waiting.items() for i, future in enumerate(key_futures)}
+        frames = {key: [None] * len(key_futures) for key, key_futures in waiting.items()}
+        total = len(futures)
+        done_count = 0
+        if progress:
+            progress(done_count, total)
+        pending = set(futures)
+        while pending:
+            # Short waits keep the caller's loading screen animating
+            done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, i = futures[future]
+                frames[key][i] = finish_image(future.result())
+                done_count += 1
+            if progress:
+                progress(done_count, total)
+        self.frame_sets.update(frames)
+
+        for name in names:
+            _, _, animation = IMAGE_ASSETS[name]
+            frame_list = self.frame_sets[self._frame_key(name)]
+            self.assets[name] = Animation(frame_list, **animation) if animation is not None else frame_list
+        return {name: self.assets[name] for name in names}
+
+    def load_sfx(self, names):
+        for name in names:
+            self.sfx[name] = load_sound(SOUND_ASSETS[name], volume=SOUND_VOLUMES[name])
+
+    def load_all_assets(self, progress=None):
+        self.load_image_sets(list(IMAGE_ASSETS), progress)
+        self.load_sfx(list(SOUND_ASSETS))
 
     def get_rotated_image(self, tile_type, variant, rotation):
-        key = (tile_type, variant, rotation)  
-        
+        key = (tile_type, variant, rotation)
+
         if key not in self.rotated_cache:
             original = self.assets[tile_type][variant]
             self.rotated_cache[key] = pygame.transform.rotate(original, rotation)
-        
+
         return self.rotated_cache[key]
-    
\ No newline at end of file
@@ -0,0 +1,102 @@
+import json
+from pathlib import Path
+import pygame
+from scripts.constants import (
+    BASE_IMG_PATH, ATLAS_IMAGE_PATH, ATLAS_INDEX_PATH, ATLAS_SOURCE_DIRS,
+    ATLAS_MAX_WIDTH, DEFAULT_REMOVE_COLOR
+)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def atlas_groups(source_dirs=ATLAS_SOURCE_DIRS):
+    # Every folder of frames below the source dirs, e.g. 'tiles/grass', 'player/run'
+    groups = []
+    for source in source_dirs:
+        for group_dir in sorted((Path(BASE_IMG_PATH) / source).iterdir()):
+            if group_dir.is_dir():
+                groups.append(f"{source}/{group_dir.name}")
+    return groups
+
+
+def pack_atlas(groups=None, image_path=ATLAS_IMAGE_PATH, index_path=ATLAS_INDEX_PATH, max_width=ATLAS_MAX_WIDTH):
+    groups = atlas_groups() if groups is None else groups
+
+    frames = []
+    for group in groups:
+        paths = [p for p in sorted((Path(BASE_IMG_PATH) / group).iterdir())
+                 if p.suffix.lower() in IMAGE_EXTENSIONS]
+        for i, path in enumerate(paths):
+            frames.append((group, i, pygame.image.load(str(path))))
+
+    # Shelf packing, tallest frames first so rows waste little height
+    order = sorted(frames, key=lambda frame: frame[2].get_height(), reverse=True)
+    placements = {}
+    x = y = shelf_height = 0
+    width = 0
+    for group, i, img in order:
+        w, h = img.get_size()
+        if x + w > max_width and x > 0:
+            y += shelf_height
+            x = shelf_height = 0
+        placements[(group, i)] = (x, y, w, h)
+        x += w
+        width = max(width, x)
+        shelf_height = max(shelf_height, h)
+    height = y + shelf_height
+
+    atlas = pygame.Surface((max(1, width), max(1, height)))
+    atlas.fill(DEFAULT_REMOVE_COLOR)
+    index = {group: [] for group in groups}
+    for group, i, img in frames:
+        rect = placements[(group, i)]
+        atlas.blit(img, rect[:2])
+        index[group].append(list(rect))
+
+    pygame.image.save(atlas, image_path)
+    with open(index_path, 'w') as f:
+        json.dump({'image': Path(image_path).name, 'frames': index}, f)
+    return index
+
+
+class TextureAtlas:
+    def __init__(self, image_path=ATLAS_IMAGE_PATH, index_path=ATLAS_INDEX_PATH, remove_color=DEFAULT_REMOVE_COLOR):
+        with open(index_path, 'r') as f:
+            self.index = json.load(f)['frames']
+        self.image = pygame.image.load(image_path).convert()
+        self.remove_color = remove_color
+        if remove_color is not None:
+            self.image.set_colorkey(remove_color)
+        # (group, size) -> strip surface holding every frame of the group at that size
+        self.strips = {}
+
+    def __contains__(self, group):
+        return group in self.index
+
+    def frames(self, group, scale=None):
+        rects = self.index[group]
+        if scale is None:
+            return [self.image.subsurface(rect) for rect in rects]
+
+        w, h = int(scale[0]), int(scale[1])
+        key = (group, w, h)
+        if key not in self.strips:
+            strip = pygame.Surface((w * len(rects), h)).convert()
+            for i, rect in enumerate(rects):
+                strip.blit(pygame.transform.scale(self.image.subsurface(rect), (w, h)), (i * w, 0))
+            if self.remove_color is not None:
+                strip.set_colorkey(self.remove_color)
+            self.strips[key] = strip
+        strip = self.strips[key]
+        return [strip.subsurface((i * w, 0, w, h)) for i in range(len(rects))]
+
+
+def load_atlas():
+    if not (Path(ATLAS_IMAGE_PATH).exists() and Path(ATLAS_INDEX_PATH).exists()):
+        return None
+    return TextureAtlas()
+
+
+if __name__ == '__main__':
+    index = pack_atlas()
+    print(f"Packed {sum(len(rects) for rects in index.values())} frames from {len(index)} groups into {ATLAS_IMAGE_PATH}")
@@ -0,0 +1,82 @@
+from pathlib import Path
+import pygame
+from scripts.constants import SFX_PATH, SOUND_EXTENSIONS, DEFAULT_SOUND_VOLUME
+
+
+class AudioService:
+    def __init__(self):
+        self.current_music = None
+        self.music_playing = False
+        self.music_paused = False
+
+    def init_mixer(self):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+
+    def play_music(self, path, volume, loops=-1):
+        self.init_mixer()
+        path = str(path)
+        pygame.mixer.music.set_volume(volume)
+        # Asking for the track that is already on is a no-op, not a reload
+        if self.music_playing and self.current_music == path:
+            self.resume_music()
+            return
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.play(loops)
+        self.current_music = path
+        self.music_playing = True
+        self.music_paused = False
+
+    def pause_music(self):
+        if self.music_playing and not self.music_paused:
+            pygame.mixer.music.pause()
+            self.music_paused = True
+
+    def resume_music(self):
+        if self.music_playing and self.music_paused:
+            pygame.mixer.music.unpause()
+            self.music_paused = False
+
+    def stop_music(self):
+        if self.music_playing:
+            pygame.mixer.music.stop()
+            self.music_playing = False
+            self.music_paused = False
+
+
+class SoundBank:
+    def __init__(self):
+        self.decoded = {}
+        self.sounds = {}
+        self.folders = {}
+
+    def sound(self, path, volume=DEFAULT_SOUND_VOLUME):
+        path = Path(path).as_posix()
+        key = (path, volume)
+        if key not in self.sounds:
+            audio.init_mixer()
+            if path not in self.decoded:
+                sound = pygame.mixer.Sound(str(Path(SFX_PATH) / path))
+                self.decoded[path] = sound
+            else:
+                # Volume lives on the Sound, so another volume gets its own
+                # object built from the already decoded samples
+                sound = pygame.mixer.Sound(buffer=self.decoded[path].get_raw())
+            sound.set_volume(volume)
+            self.sounds[key] = sound
+        return self.sounds[key]
+
+    def folder(self, path, volume=DEFAULT_SOUND_VOLUME):
+        key = (Path(path).as_posix(), volume)
+        if key not in self.folders:
+            dir_path = Path(SFX_PATH) / path
+            self.folders[key] = [
+                self.sound(snd_path.relative_to(SFX_PATH), volume)
+                for snd_path in sorted(dir_path.iterdir())
+                if snd_path.suffix.lower() in SOUND_EXTENSIONS
+            ]
+        return self.folders[key]
+
+
+audio = AudioService()
+sound_bank = SoundBank()
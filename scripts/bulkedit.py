@@ -0,0 +1,110 @@
+from collections import deque
+from scripts.constants import *
+from scripts.edithistory import tile_state, offgrid_state, state_tile, offgrid_tile
+
+# Editor tools, cycled with B. The brush paints one tile per frame under the
+# cursor; the others collect their cells first and apply them as one edit.
+EDITOR_TOOLS = ('brush', 'rect', 'fill', 'select')
+
+# Tiles that are unique or span two cells are placed with the brush only
+BULK_EXCLUDED_TYPES = {'spawners', 'finish', 'portal'}
+# Placed as an "up" and a "down" tile, one above the other
+PAIRED_TILE_TYPES = ('finish', 'portal')
+
+
+def normalize_rect(a, b):
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[0], b[0]), max(a[1], b[1])
+
+
+def rect_cells(a, b):
+    x0, y0, x1, y1 = normalize_rect(a, b)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def in_rect(pos, rect):
+    # Offgrid positions are fractional tile coordinates
+    x0, y0, x1, y1 = rect
+    return x0 <= pos[0] < x1 + 1 and y0 <= pos[1] < y1 + 1
+
+
+def pair_offset(tile_type):
+    # Row offset from a finish or portal half to its other half; None for
+    # any other tile
+    parts = tile_type.split()
+    if len(parts) < 2 or parts[0] not in PAIRED_TILE_TYPES:
+        return None
+    return 1 if parts[1] == 'up' else -1
+
+
+def flood_region(tilemap, start, limit=EDITOR_FLOOD_LIMIT):
+    # Cells 4-connected to start holding the same tile type, or all empty.
+    # Empty regions are confined to the map's bounding box plus a margin of
+    # one, so flooding open space fills around the map rather than forever.
+    # None when the region would exceed limit cells.
+    def type_at(x, y):
+        tile = tilemap.get(f"{x};{y}")
+        return tile[TYPE] if tile is not None else None
+
+    target = type_at(*start)
+    if target is None:
+        if not tilemap:
+            return None
+        xs = [tile[POS][0] for tile in tilemap.values()]
+        ys = [tile[POS][1] for tile in tilemap.values()]
+        bounds = (min(xs) - 1, min(ys) - 1, max(xs) + 1, max(ys) + 1)
+        if not in_rect(start, bounds):
+            return None
+    else:
+        bounds = None
+
+    region = {start}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        for dx, dy in AUTOTILE_SHIFTS:
+            cell = (x + dx, y + dy)
+            if cell in region or type_at(*cell) != target:
+                continue
+            if bounds is not None and not in_rect(cell, bounds):
+                continue
+            if len(region) >= limit:
+                return None
+            region.add(cell)
+            queue.append(cell)
+    return region
+
+
+class Clipboard:
+    # A copied region as immutable tile states relative to its top-left
+    # corner; spawners stay behind since a map holds only one, and so does
+    # a finish or portal half whose other half lies outside the region
+    def __init__(self, tilemap, offgrid_tiles, rect):
+        x0, y0 = rect[0], rect[1]
+        self.cells = []
+        for x, y in rect_cells(rect[:2], rect[2:]):
+            tile = tilemap.get(f"{x};{y}")
+            if tile is None or tile[TYPE].split()[0] == SPAWNER:
+                continue
+            offset = pair_offset(tile[TYPE])
+            if offset is not None and not y0 <= y + offset <= rect[3]:
+                continue
+            self.cells.append((x - x0, y - y0, tile_state(tile)))
+        self.offgrid = [
+            offgrid_state({**tile, POS: [tile[POS][0] - x0, tile[POS][1] - y0]})
+            for tile in offgrid_tiles
+            if in_rect(tile[POS], rect) and tile[TYPE].split()[0] != SPAWNER
+        ]
+        self.size = (rect[2] - x0 + 1, rect[3] - y0 + 1)
+
+    def paste_at(self, origin):
+        # Grid changes and new offgrid tiles for a paste with its top-left
+        # corner at origin
+        ox, oy = origin
+        cells = {}
+        for dx, dy, state in self.cells:
+            pos = (ox + dx, oy + dy)
+            cells[pos] = state_tile(state, f"{pos[0]};{pos[1]}")
+        offgrid = []
+        for tile_type, variant, rotation, x, y in self.offgrid:
+            offgrid.append(offgrid_tile((tile_type, variant, rotation, x + ox, y + oy)))
+        return cells, offgrid
@@ -1,23 +1,50 @@
+import os
 import pygame
 
-pygame.init()
-info = pygame.display.Info()
-
 # =============================================================================
 # DISPLAY CONFIGURATION
 # =============================================================================
-screen_width, screen_height = info.current_w, info.current_h
-DISPLAY_SIZE = (screen_width, screen_height)
-aspect_x = DISPLAY_SIZE[0] - (DISPLAY_SIZE[0] % 16)
-aspect_y = DISPLAY_SIZE[1] - (DISPLAY_SIZE[1] % 9)
-DISPLAY_SIZE = (aspect_x, aspect_y)
-TILE_SIZE = DISPLAY_SIZE[0] // 24
+REFERENCE_SIZE = (1920, 1080)
+REFERENCE_TILE_SIZE = REFERENCE_SIZE[0] // 24
+
+# Headless runs (training workers, tools) never query the monitor: nothing
+# touches SDL at import and tile size, and with it every physics constant,
+# is the same fixed reference on any machine. Enable with ASCENT_HEADLESS=1;
+# SDL's dummy video driver implies it.
+HEADLESS = (os.environ.get('ASCENT_HEADLESS', '0') not in ('', '0')
+            or os.environ.get('SDL_VIDEODRIVER') == 'dummy')
+
+def resolve_display_size(headless=HEADLESS):
+    if headless:
+        return REFERENCE_SIZE
+    # Only the video subsystem is needed to ask for the monitor size
+    pygame.display.init()
+    info = pygame.display.Info()
+    screen_width, screen_height = info.current_w, info.current_h
+    return (screen_width - (screen_width % 16), screen_height - (screen_height % 9))
+
+def resolve_tile_size(render_size, headless=HEADLESS):
+    return REFERENCE_TILE_SIZE if headless else render_size[0] // 24
+
+DISPLAY_SIZE = resolve_display_size()
+
+# Internal resolution the game world is drawn at before being scaled to the
+# display. Lower values trade sharpness for frame rate on high-DPI screens;
+# tiles and sprites are loaded at the smaller size too. HUD text stays native.
+RENDER_SCALE = 1.0
+RENDER_FILTER = 'nearest'  # 'nearest' or 'smooth'
+RENDER_SIZE = (int(DISPLAY_SIZE[0] * RENDER_SCALE), int(DISPLAY_SIZE[1] * RENDER_SCALE))
+TILE_SIZE = resolve_tile_size(RENDER_SIZE)
 
 FPS = 60
 
+# Only push changed screen regions to the display instead of flipping it whole
+DIRTY_RECT_RENDERING = False
+
 # =============================================================================
 # PHYSICS CONSTANTS
 # =============================================================================
+# Tuned at a 36px tile and scaled with TILE_SIZE
 PLAYER_SPEED = 0.8 * TILE_SIZE / 36
 JUMP_SPEED = 11 * TILE_SIZE / 36
 WALLSLIDE_SPEED = 1 * TILE_SIZE / 36
@@ -81,6 +108,10 @@ SPIKE_POSITION_OFFSETS = {
     ),
 }
 
+# Pixel observations for vision agents: output size and tiles visible across it
+OBS_SIZE = (84, 84)
+OBS_VIEW_TILES = 21
+
 # =============================================================================
 # TILE DEFINITIONS
 # =============================================================================
@@ -107,15 +138,40 @@ ROTATION = 'rotation'
 # FILE PATHS
 # =============================================================================
 BASE_IMG_PATH = 'data/images/'
+
+# Maps may be stored as JSON or in the compact binary format
+MAPS_DIR = 'data/maps'
+BINARY_MAP_EXTENSION = '.bmap'
+MAP_EXTENSIONS = ('.json', BINARY_MAP_EXTENSION)
+# Binary maps are laid out in square chunks of tiles. Big ones are memory
+# mapped and only the chunks around the player and camera are decoded.
+MAP_CHUNK_SIZE = 32
+MAP_STREAM_RADIUS = 1
+MAP_STREAM_MIN_TILES = 20000
+# Derived data baked next to a map when it is saved (see scripts/mapcompile.py)
+COMPILED_MAP_SUFFIX = '.compiled.npz'
+# Map previews rasterized from the tile grid, cached by map content
+THUMBNAIL_CACHE_DIR = 'data/cache/thumbnails'
+THUMBNAIL_SIZE = (240, 100)
+COMPILE_AUTOTILE = True
 FONT = r'data\fonts\Menu.ttf'
 
+# Texture atlas baked by `python -m scripts.atlas` from the folders below
+ATLAS_IMAGE_PATH = 'data/images/atlas.png'
+ATLAS_INDEX_PATH = 'data/images/atlas.json'
+ATLAS_SOURCE_DIRS = ('tiles', 'player')
+ATLAS_MAX_WIDTH = 1024
+
 # Music path
 MUSIC_PATH = r'data\sfx\music\music.ogg'
+MENU_MUSIC_PATH = 'data/sfx/music/menu.ogg'
+SFX_PATH = 'data/sfx'
 
 # =============================================================================
 # AUDIO SETTINGS
 # =============================================================================
 MUSIC_VOLUME = 0.05
+MENU_MUSIC_VOLUME = 0.2
 
 # Sound effect volumes
 SOUND_VOLUMES = {
@@ -135,6 +191,35 @@ FONT = r'data\fonts\Menu.ttf'
 
 # Editor/UI
 EDITOR_SCROLL_SPEED = 12
+# Re-autotile the painted cell and its neighbours on every edit (L toggles)
+EDITOR_LIVE_AUTOTILE = True
+# Undo history budget, in recorded cell/offgrid changes
+EDITOR_HISTORY_MAX_CHANGES = 200_000
+# Unsaved edits are written here in the background every interval (ms)
+EDITOR_AUTOSAVE_DIR = 'data/cache/autosave'
+EDITOR_AUTOSAVE_INTERVAL = 60_000
+# Zoom levels whose scaled tiles are kept in memory
+EDITOR_ZOOM_CACHE_SIZE = 6
+EDITOR_GRID_COLOR = (50, 50, 50)
+# At or below this zoom the editor draws chunk colour images instead of tiles
+EDITOR_LOD_ZOOM = 4
+# Largest region a single flood fill may touch
+EDITOR_FLOOD_LIMIT = 250_000
+# Cells a playtest started at the cursor may be moved up out of a wall
+EDITOR_PLAYTEST_NUDGE = 3
+
+# Map validator: frames each searched input is held, and how finely states
+# are told apart (steps per tile and per tile per frame)
+VALIDATOR_MACRO_FRAMES = 6
+VALIDATOR_POSITION_STEPS = 2
+VALIDATOR_SPEED_STEPS = 4
+# Weight of the distance to the finish against moves taken; above 1 the
+# search heads for the finish sooner at the cost of longer witnesses
+VALIDATOR_GREED = 2.0
+# Search budget per map (states, seconds)
+VALIDATOR_MAX_STATES = 300_000
+VALIDATOR_TIME_LIMIT = 10.0
+
 MENUBG = r'data\images\menugbg.jpg'
 MENUTXTCOLOR = (120, 83, 58)
 WHITE = (255, 255, 255)
@@ -150,7 +235,13 @@ DEFAULT_HOVER_VOLUME = 0.01
 DEFAULT_CLICK_VOLUME = 0.05
 MIN_FONT_SIZE = 12
 MAX_FONT_SIZE = 72
-REFERENCE_SIZE = (1920, 1080)
+
+# Worker threads decoding and scaling images during loading
+ASSET_LOADER_THREADS = min(8, os.cpu_count() or 2)
+
+# Scaled, display-ready pixels of every loaded image, reused on later launches
+IMAGE_CACHE_ENABLED = True
+IMAGE_CACHE_DIR = 'data/cache/images'
 
 # =============================================================================
 def calculate_ui_constants(display_size):
@@ -182,4 +273,11 @@ AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (-1, 0), (0, 1), (0, -1)])): 8,
 }
 
+# Neighbour shift -> bit of the autotile mask
+AUTOTILE_SHIFTS = {(1, 0): 1, (-1, 0): 2, (0, -1): 4, (0, 1): 8}
+# Bounding boxes larger than this many cells are autotiled tile by tile
+AUTOTILE_DENSE_LIMIT = 4_000_000
+# Edits touching at least this many cells are autotiled through the dense grid
+AUTOTILE_BATCH_MIN = 256
+
 NEIGHBOR_OFFSETS = [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (0, 0), (-1, 1), (0, 1), (1, 1)]
\ No newline at end of file
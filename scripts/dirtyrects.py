@@ -0,0 +1,48 @@
+import pygame
+from scripts.constants import DIRTY_RECT_RENDERING
+
+
+class DirtyRectRenderer:
+    def __init__(self, enabled=DIRTY_RECT_RENDERING):
+        self.enabled = enabled
+        self.rects = []
+        self.previous_rects = []
+        self.partial = False
+        self.force_full = True
+        self.last_view = None
+
+    def begin(self, view=None):
+        # A renderer opts into partial updates for this frame; any change of
+        # view (camera scroll, zoom) means the whole world moved on screen
+        self.partial = self.enabled and not self.force_full and view == self.last_view
+        self.last_view = view
+        self.force_full = False
+
+    def add(self, rect):
+        if rect is not None:
+            self.rects.append(pygame.Rect(rect))
+
+    def add_all(self, rects):
+        for rect in rects:
+            self.add(rect)
+
+    def invalidate(self):
+        self.force_full = True
+        self.partial = False
+
+    def present(self):
+        if self.partial:
+            # Last frame's regions are refreshed too so moved sprites are erased
+            rects = self.previous_rects + self.rects
+            if rects:
+                pygame.display.update(rects)
+        else:
+            pygame.display.flip()
+
+        self.previous_rects = self.rects
+        self.rects = []
+        # States that never call begin() keep getting full flips
+        self.partial = False
+
+
+display_updater = DirtyRectRenderer()
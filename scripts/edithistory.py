@@ -0,0 +1,137 @@
+from collections import deque
+from scripts.constants import EDITOR_HISTORY_MAX_CHANGES, TYPE, VARIANT, POS, ROTATION
+
+
+def tile_state(tile):
+    # Compact, immutable copy of a grid tile; None for an empty cell. Tiles
+    # are mutated in place (autotile, rotation), so history never keeps the
+    # dicts themselves.
+    if tile is None:
+        return None
+    return tile[TYPE], tile[VARIANT], tile.get(ROTATION)
+
+
+def offgrid_state(tile):
+    return tile[TYPE], tile[VARIANT], tile.get(ROTATION), tile[POS][0], tile[POS][1]
+
+
+def state_tile(state, loc):
+    tile_type, variant, rotation = state
+    x, y = loc.split(';')
+    tile = {TYPE: tile_type, VARIANT: variant, POS: [int(x), int(y)]}
+    if rotation is not None:
+        tile[ROTATION] = rotation
+    return tile
+
+
+def offgrid_tile(state):
+    tile_type, variant, rotation, x, y = state
+    tile = {TYPE: tile_type, VARIANT: variant, POS: [x, y]}
+    if rotation is not None:
+        tile[ROTATION] = rotation
+    return tile
+
+
+class Stroke:
+    # Everything one brush stroke changed. Cells keep their first "before"
+    # and latest "after", so repainting a cell every frame costs nothing.
+    __slots__ = ('cells', 'offgrid')
+
+    def __init__(self):
+        self.cells = {}
+        self.offgrid = []
+
+    def __len__(self):
+        return len(self.cells) + len(self.offgrid)
+
+    def compact(self):
+        self.cells = {loc: change for loc, change in self.cells.items() if change[0] != change[1]}
+        return self
+
+
+class EditHistory:
+    def __init__(self, max_changes=EDITOR_HISTORY_MAX_CHANGES):
+        self.max_changes = max_changes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.open_stroke = None
+        self.size = 0
+        self.replaying = False
+        # Bumped on every change to the map, to tell when it needs saving
+        self.revision = 0
+
+    def begin_stroke(self):
+        if self.open_stroke is None:
+            self.open_stroke = Stroke()
+
+    def end_stroke(self):
+        stroke, self.open_stroke = self.open_stroke, None
+        if stroke is None or not len(stroke.compact()):
+            return
+        self.undo_stack.append(stroke)
+        self.size += len(stroke)
+        self.redo_stack.clear()
+        # Oldest strokes go first once the budget is exceeded
+        while self.size > self.max_changes and len(self.undo_stack) > 1:
+            self.size -= len(self.undo_stack.popleft())
+
+    def _stroke(self):
+        # Changes made outside a stroke form a stroke of their own
+        if self.open_stroke is None:
+            self.begin_stroke()
+            return self.open_stroke, True
+        return self.open_stroke, False
+
+    def record_cell(self, loc, before, after):
+        if self.replaying:
+            return
+        self.revision += 1
+        stroke, single = self._stroke()
+        if loc in stroke.cells:
+            before = stroke.cells[loc][0]
+        stroke.cells[loc] = (before, after)
+        if single:
+            self.end_stroke()
+
+    def record_cells(self, changes):
+        # Batched record_cell for (loc, before, after) triples
+        if self.replaying:
+            return
+        self.revision += 1
+        stroke, single = self._stroke()
+        cells = stroke.cells
+        for loc, before, after in changes:
+            if loc in cells:
+                before = cells[loc][0]
+            cells[loc] = (before, after)
+        if single:
+            self.end_stroke()
+
+    def record_offgrid(self, state, added):
+        if self.replaying:
+            return
+        self.revision += 1
+        stroke, single = self._stroke()
+        stroke.offgrid.append((state, added))
+        if single:
+            self.end_stroke()
+
+    def undo(self):
+        self.end_stroke()
+        if not self.undo_stack:
+            return None
+        stroke = self.undo_stack.pop()
+        self.revision += 1
+        self.size -= len(stroke)
+        self.redo_stack.append(stroke)
+        return stroke
+
+    def redo(self):
+        self.end_stroke()
+        if not self.redo_stack:
+            return None
+        stroke = self.redo_stack.pop()
+        self.revision += 1
+        self.undo_stack.append(stroke)
+        self.size += len(stroke)
+        return stroke
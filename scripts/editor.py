@@ -3,10 +3,26 @@ import sys
 import pygame
 import os
 import json
+from collections import OrderedDict
 from scripts.utils import load_images, load_image, find_next_numeric_filename
 from scripts.tilemap import Tilemap
-from scripts.constants import TILE_SIZE, DISPLAY_SIZE, FPS, PHYSICS_TILES, FONT, EDITOR_SCROLL_SPEED
+from scripts.constants import (
+    TILE_SIZE, DISPLAY_SIZE, FPS, PHYSICS_TILES, FONT, EDITOR_SCROLL_SPEED, EDITOR_LIVE_AUTOTILE,
+    EDITOR_AUTOSAVE_DIR, EDITOR_AUTOSAVE_INTERVAL, EDITOR_ZOOM_CACHE_SIZE, EDITOR_GRID_COLOR,
+    EDITOR_LOD_ZOOM, EDITOR_PLAYTEST_NUDGE
+)
 from scripts.GameManager import game_state_manager
+from scripts.dirtyrects import display_updater
+from scripts.mapcatalog import map_catalog
+from scripts.mapsaver import map_saver
+from scripts.validator import map_problems
+from scripts.lodrender import LODRenderer
+from scripts.bulkedit import (
+    EDITOR_TOOLS, BULK_EXCLUDED_TYPES, PAIRED_TILE_TYPES, pair_offset, normalize_rect, rect_cells, in_rect,
+    flood_region, Clipboard
+)
+from scripts.environment import Environment
+from scripts.edithistory import EditHistory, tile_state, offgrid_state, state_tile, offgrid_tile
 
 class EditorMenu:
     def __init__(self, display):
@@ -56,12 +72,21 @@ class EditorMenu:
         if self.editor:
             return self.editor.run()
 
+# Tile types whose positions the editor keeps indexed for its per-frame UI
+SPECIAL_TILE_TYPES = ('spawners', 'finish', 'portal')
+
+def is_spawner(tile):
+    return tile['type'].split()[0] == 'spawners' and tile['variant'] in (0, 1)
+
 class Editor:
     def __init__(self, menu, map_file=None):
         self.menu = menu
         pygame.init()
         pygame.display.set_caption('editor')
-        self.display = pygame.display.set_mode(DISPLAY_SIZE)
+        # Reuse the game's window; recreating it drops every converted surface
+        self.display = pygame.display.get_surface()
+        if self.display is None or self.display.get_size() != DISPLAY_SIZE:
+            self.display = pygame.display.set_mode(DISPLAY_SIZE)
         self.clock = pygame.time.Clock()
         
         self.zoom = 10
@@ -69,9 +94,16 @@ class Editor:
         self.scroll = [0, 0]
         self.current_map_file = map_file
         
+        # Tiles are read from disk once; every zoom level is scaled from these
+        self.original_assets = self.load_original_assets()
+        # tile size -> (assets, rotated images), least recently used first
+        self.zoom_cache = OrderedDict()
+        # Screen-sized, so only the current zoom's overlay is kept
+        self.grid_overlay = None
+        self.grid_tile_size = None
         self.assets = self.reload_assets()
+        self.lod = LODRenderer(self.original_assets)
         self.background_image = load_image('background/background.png', scale=DISPLAY_SIZE)
-        self.rotated_assets = {}
         
         # Menu system
         self.menu_width = 170
@@ -81,6 +113,15 @@ class Editor:
         self.tile_variant = 0
         self.current_rotation = 0
         self.ongrid = True
+        self.live_autotile = EDITOR_LIVE_AUTOTILE
+        self.tool = EDITOR_TOOLS[0]
+        # Tile where a rect/select drag started, and the mouse button used
+        self.drag_start = None
+        self.drag_button = None
+        self.selection = None
+        self.clipboard = None
+        # Kept between playtests so only the first one builds fonts and menus
+        self.playtest_env = None
         
         self.tile_type_thumbs = self.generate_tile_type_thumbs()
         
@@ -95,6 +136,9 @@ class Editor:
         self.show_save_message = False
         self.save_message_timer = 0
         self.save_message_duration = 80
+        self.save_message = ""
+        # Quick-check problems of saves still being written, by path
+        self.save_problems = {}
         
         # Fonts
         self.font = pygame.font.SysFont(FONT, 16)
@@ -106,6 +150,10 @@ class Editor:
                 self.tilemap.load(self.current_map_file)
             except FileNotFoundError:
                 pass
+        self.rebuild_special_index()
+        self.history = EditHistory()
+        self.autosaved_revision = self.history.revision
+        self.last_autosave = pygame.time.get_ticks()
 
     def generate_tile_type_thumbs(self):
         thumbs = {}
@@ -132,20 +180,48 @@ class Editor:
         
         return self.rotated_assets[key]
     
-    def reload_assets(self):
-        IMGscale = (self.tilemap.tile_size, self.tilemap.tile_size)
-        assets = {
-            'decor': load_images('tiles/decor', scale=IMGscale),
-            'grass': load_images('tiles/grass', scale=IMGscale),
-            'pinkrock' : load_images('tiles/pinkrock', scale=IMGscale),
-            'stone': load_images('tiles/stone', scale=IMGscale),
-            'spawners': load_images('tiles/spawners', scale=IMGscale),
-            'spikes': load_images('tiles/spikes', scale=IMGscale),
-            'finish': load_images('tiles/finish', scale=(IMGscale[0], IMGscale[1]*2)),
-            'kill': load_images('tiles/kill', scale=IMGscale),
+    def load_original_assets(self):
+        return {
+            tile_type: load_images(f'tiles/{tile_type}')
+            for tile_type in ('decor', 'grass', 'pinkrock', 'stone', 'spawners', 'spikes', 'finish', 'kill')
         }
-        self.rotated_assets = {}
+
+    def reload_assets(self):
+        # Scaled tiles for the current zoom, from the cache when this zoom was
+        # used recently; rotated images are kept with them
+        tile_size = self.tilemap.tile_size
+        if tile_size in self.zoom_cache:
+            self.zoom_cache.move_to_end(tile_size)
+        else:
+            assets = {}
+            for tile_type, images in self.original_assets.items():
+                scale = (tile_size, tile_size * 2) if tile_type == 'finish' else (tile_size, tile_size)
+                assets[tile_type] = [pygame.transform.scale(img, scale) for img in images]
+            self.zoom_cache[tile_size] = (assets, {})
+            if len(self.zoom_cache) > EDITOR_ZOOM_CACHE_SIZE:
+                self.zoom_cache.popitem(last=False)
+        assets, self.rotated_assets = self.zoom_cache[tile_size]
+        if tile_size != self.grid_tile_size:
+            self.build_grid_overlay(tile_size)
         return assets
+
+    def build_grid_overlay(self, tile_size):
+        # At least one tile larger than the screen, so any scroll offset is a
+        # single blit. The surface is redrawn in place on zoom changes and
+        # only reallocated when a larger zoom needs a bigger one.
+        size = (DISPLAY_SIZE[0] + tile_size, DISPLAY_SIZE[1] + tile_size)
+        overlay = self.grid_overlay
+        if overlay is None or overlay.get_width() < size[0] or overlay.get_height() < size[1]:
+            overlay = pygame.Surface(size).convert()
+            overlay.set_colorkey((0, 0, 0))
+        width, height = overlay.get_size()
+        overlay.fill((0, 0, 0))
+        for x in range(0, width, tile_size):
+            overlay.fill(EDITOR_GRID_COLOR, (x, 0, 1, height))
+        for y in range(0, height, tile_size):
+            overlay.fill(EDITOR_GRID_COLOR, (0, y, width, 1))
+        self.grid_overlay = overlay
+        self.grid_tile_size = tile_size
     
     def setZoom(self, zoom):
         self.zoom = int(zoom)
@@ -162,10 +238,109 @@ class Editor:
         
         self.tilemap.tile_size = new_tile_size
         self.assets = self.reload_assets()
-        self.tile_type_thumbs = self.generate_tile_type_thumbs()
     
+    def rebuild_special_index(self):
+        # Grid locations per special type, plus offgrid spawners; kept up to
+        # date by the mutation helpers below instead of rescanning the map
+        self.special_locs = {tile_type: set() for tile_type in SPECIAL_TILE_TYPES}
+        for loc, tile in self.tilemap.tilemap.items():
+            self._index_tile(loc, tile)
+        self.offgrid_spawners = [tile for tile in self.tilemap.offgrid_tiles if is_spawner(tile)]
+        # The far-zoom image is rebuilt lazily the next time it is shown
+        self.lod.invalidate()
+
+    def _index_tile(self, loc, tile):
+        base_type = tile['type'].split()[0]
+        if base_type in self.special_locs and (base_type != 'spawners' or is_spawner(tile)):
+            self.special_locs[base_type].add(loc)
+
+    def _set_tile(self, tile_pos, tile):
+        loc = f"{tile_pos[0]};{tile_pos[1]}"
+        before = self._unlink_tile(loc)
+        self.tilemap.tilemap[loc] = tile
+        self._index_tile(loc, tile)
+        self.lod.set_cell(tile_pos, tile['type'])
+        self.history.record_cell(loc, tile_state(before), tile_state(tile))
+
+    def _remove_tile(self, loc):
+        tile = self._unlink_tile(loc)
+        if tile is not None:
+            self.lod.set_cell(tile['pos'], None)
+            self.history.record_cell(loc, tile_state(tile), None)
+        return tile
+
+    def _unlink_tile(self, loc):
+        tile = self.tilemap.tilemap.pop(loc, None)
+        if tile is not None:
+            base_type = tile['type'].split()[0]
+            if base_type in self.special_locs:
+                self.special_locs[base_type].discard(loc)
+        return tile
+
+    def _add_offgrid(self, tile):
+        self.tilemap.offgrid_tiles.append(tile)
+        if is_spawner(tile):
+            self.offgrid_spawners.append(tile)
+        self.history.record_offgrid(offgrid_state(tile), True)
+
+    def _remove_offgrid(self, tile):
+        self.tilemap.offgrid_tiles.remove(tile)
+        if is_spawner(tile):
+            self.offgrid_spawners.remove(tile)
+        self.history.record_offgrid(offgrid_state(tile), False)
+
+    def apply_stroke(self, stroke, undo):
+        # Replays a recorded stroke through the mutation helpers, so the
+        # special-tile index stays right, without recording it again
+        self.history.replaying = True
+        try:
+            for loc, (before, after) in stroke.cells.items():
+                state = before if undo else after
+                if state is None:
+                    self._remove_tile(loc)
+                else:
+                    tile = state_tile(state, loc)
+                    self._set_tile(tile['pos'], tile)
+            for state, added in (reversed(stroke.offgrid) if undo else stroke.offgrid):
+                if added != undo:
+                    self._add_offgrid(offgrid_tile(state))
+                else:
+                    match = next((tile for tile in self.tilemap.offgrid_tiles if offgrid_state(tile) == state), None)
+                    if match is not None:
+                        self._remove_offgrid(match)
+        finally:
+            self.history.replaying = False
+        if self.live_autotile:
+            self.tilemap.autotile_at([tuple(map(int, loc.split(';'))) for loc in stroke.cells])
+        display_updater.invalidate()
+
+    def undo(self):
+        stroke = self.history.undo()
+        if stroke is not None:
+            self.apply_stroke(stroke, undo=True)
+
+    def redo(self):
+        stroke = self.history.redo()
+        if stroke is not None:
+            self.apply_stroke(stroke, undo=False)
+
+    def autotile_all(self):
+        # Full pass as one undoable step: only the variants it changed are logged
+        before = {loc: tile_state(tile) for loc, tile in self.tilemap.tilemap.items()}
+        self.tilemap.autotile()
+        self.history.begin_stroke()
+        for loc, tile in self.tilemap.tilemap.items():
+            self.history.record_cell(loc, before[loc], tile_state(tile))
+        self.history.end_stroke()
+
     def count_spawners(self):
-        return len(self.tilemap.extract([('spawners', 0), ('spawners', 1)], keep=True))
+        return len(self.special_locs['spawners']) + len(self.offgrid_spawners)
+
+    def remove_spawners(self):
+        for loc in list(self.special_locs['spawners']):
+            self._remove_tile(loc)
+        for tile in list(self.offgrid_spawners):
+            self._remove_offgrid(tile)
     
     def rotate_spike_at_position(self, pos):
         tile_loc = f"{pos[0]};{pos[1]}"
@@ -174,39 +349,186 @@ class Editor:
             if tile['type'] == 'spikes':
                 current_rot = tile.get('rotation', 0)
                 new_rot = (current_rot - 90) % 360
-                self.tilemap.tilemap[tile_loc]['rotation'] = new_rot
+                self._set_tile(pos, {**tile, 'rotation': new_rot})
 
     def canPlaceTile(self, mpos):
         return mpos[0] >= self.menu_width
 
+    def pair_partner(self, loc):
+        # The other half of the finish or portal block at loc, found through
+        # the special-tile index; None for any other tile
+        for tile_type in PAIRED_TILE_TYPES:
+            if loc in self.special_locs[tile_type]:
+                offset = pair_offset(self.tilemap.tilemap[loc]['type'])
+                if offset is None:
+                    return None
+                x, y = map(int, loc.split(';'))
+                partner = f"{x};{y + offset}"
+                return partner if partner in self.special_locs[tile_type] else None
+        return None
+
     def deleteGridBlock(self, tile_pos):
         tile_loc = str(tile_pos[0]) + ';' + str(tile_pos[1])
         if tile_loc in self.tilemap.tilemap:
-            tile = self.tilemap.tilemap[tile_loc]
-            tile_type = tile['type'].split()[0]
+            # 2-tile blocks (portal, finish) go as a whole
+            partner = self.pair_partner(tile_loc)
+            if partner is not None:
+                self._remove_tile(partner)
             
-            # Handle 2-tile blocks (portal, finish)
-            if tile_type in {'portal', 'finish'}:
-                if tile['type'].split()[1] == 'up':
-                    # Remove bottom part
-                    bottom_loc = str(tile_pos[0]) + ';' + str(tile_pos[1] + 1)
-                    if bottom_loc in self.tilemap.tilemap:
-                        del self.tilemap.tilemap[bottom_loc]
-                else:
-                    # Remove top part
-                    top_loc = str(tile_pos[0]) + ';' + str(tile_pos[1] - 1)
-                    if top_loc in self.tilemap.tilemap:
-                        del self.tilemap.tilemap[top_loc]
-            
-            del self.tilemap.tilemap[tile_loc]
+            self._remove_tile(tile_loc)
+            self.autotile_edit(tile_pos)
 
     def placeGridBlock(self, tile_pos, tile_type):
         self.deleteGridBlock(tile_pos)
-        self.tilemap.tilemap[str(tile_pos[0]) + ';' + str(tile_pos[1])] = {
+        self._set_tile(tile_pos, {
             'type': tile_type, 
             'variant': self.tile_variant, 
             'pos': tile_pos
-        }
+        })
+        self.autotile_edit(tile_pos)
+
+    def autotile_edit(self, tile_pos):
+        # Only the edited cell and its neighbours can change variant
+        if self.live_autotile:
+            self.tilemap.autotile_at([tile_pos])
+
+    def apply_changes(self, cells, remove_offgrid=(), add_offgrid=()):
+        # One batched edit: cells maps (x, y) to a tile or None. It is a
+        # single undo step with one autotile pass and one redraw however
+        # many tiles change.
+        tilemap = self.tilemap.tilemap
+        special_locs = self.special_locs
+        # Finish and portal blocks change as a whole: a cell covering one
+        # half clears the other, as deleting it with the brush does
+        cells = dict(cells)
+        for tile_type in PAIRED_TILE_TYPES:
+            for loc in list(special_locs[tile_type]):
+                pos = tuple(map(int, loc.split(';')))
+                partner = self.pair_partner(loc) if pos in cells else None
+                if partner is not None:
+                    cells.setdefault(tuple(map(int, partner.split(';'))), None)
+        changes = []
+        for pos, tile in cells.items():
+            loc = f"{pos[0]};{pos[1]}"
+            before = tilemap.pop(loc, None)
+            if before is not None:
+                base_type = before['type'].split()[0]
+                if base_type in special_locs:
+                    special_locs[base_type].discard(loc)
+            if tile is not None:
+                tilemap[loc] = tile
+                self._index_tile(loc, tile)
+            changes.append((loc, tile_state(before), tile_state(tile)))
+        self.lod.set_cells(list(cells), [None if tile is None else tile['type'] for tile in cells.values()])
+
+        self.history.begin_stroke()
+        self.history.record_cells(changes)
+        for tile in remove_offgrid:
+            self._remove_offgrid(tile)
+        for tile in add_offgrid:
+            self._add_offgrid(tile)
+        self.history.end_stroke()
+        if self.live_autotile and cells:
+            self.tilemap.autotile_at(list(cells))
+        display_updater.invalidate()
+
+    def brush_tile(self, pos):
+        tile_type = self.tile_list[self.tile_group]
+        if tile_type in BULK_EXCLUDED_TYPES:
+            return None
+        tile = {'type': tile_type, 'variant': self.tile_variant, 'pos': list(pos)}
+        if tile_type == 'spikes':
+            tile['rotation'] = self.current_rotation
+        return tile
+
+    def fill_cells(self, cells, erase=False, remove_offgrid=()):
+        if erase:
+            self.apply_changes({pos: None for pos in cells}, remove_offgrid=remove_offgrid)
+            return
+        template = self.brush_tile((0, 0))
+        if template is not None:
+            self.apply_changes({pos: {**template, 'pos': list(pos)} for pos in cells})
+
+    def fill_rect(self, a, b, erase=False):
+        rect = normalize_rect(a, b)
+        offgrid = [tile for tile in self.tilemap.offgrid_tiles if in_rect(tile['pos'], rect)] if erase else ()
+        self.fill_cells(rect_cells(a, b), erase, offgrid)
+
+    def flood_fill(self, tile_pos, erase=False):
+        if not erase and self.brush_tile(tile_pos) is None:
+            return
+        region = flood_region(self.tilemap.tilemap, tile_pos)
+        if region is not None:
+            self.fill_cells(region, erase)
+
+    def copy_selection(self):
+        if self.selection is not None:
+            self.clipboard = Clipboard(self.tilemap.tilemap, self.tilemap.offgrid_tiles, self.selection)
+
+    def paste(self, tile_pos):
+        if self.clipboard is None:
+            return
+        cells, offgrid = self.clipboard.paste_at(tile_pos)
+        self.apply_changes(cells, add_offgrid=offgrid)
+        self.selection = (tile_pos[0], tile_pos[1],
+                          tile_pos[0] + self.clipboard.size[0] - 1, tile_pos[1] + self.clipboard.size[1] - 1)
+
+    def playtest(self, at_cursor=False):
+        # Play the map as it is in the editor: the live tiles are snapshotted
+        # straight into an Environment sharing this window and the loaded
+        # assets. Esc or P comes back with the editor camera untouched.
+        spawn = None
+        if at_cursor:
+            tile_pos = self.free_cell_above(self.mouse_tile(pygame.mouse.get_pos()))
+            if tile_pos is None:
+                self.save_message = "No room to start a playtest here"
+                self.show_save_message = True
+                self.save_message_timer = 0
+                return
+            spawn = [tile_pos[0] * TILE_SIZE, tile_pos[1] * TILE_SIZE]
+        map_data = self.tilemap.snapshot()
+        if self.playtest_env is None:
+            self.playtest_env = Environment(
+                self.display, self.clock, ai_train_mode=False, playtest_map=map_data, spawn=spawn
+            )
+        else:
+            self.playtest_env.load_playtest(map_data, spawn)
+            self.playtest_env.start_music()
+        env = self.playtest_env
+
+        while True:
+            dt = self.clock.tick(FPS) / 1000.0
+            events = pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
+                if event.type == pygame.KEYDOWN and event.key in {pygame.K_ESCAPE, pygame.K_p}:
+                    env.stop_music()
+                    # Keys released during the playtest never reached the editor
+                    self.movement = [False] * 4
+                    self.shift = self.ctrl = False
+                    self.clicking = self.right_clicking = False
+                    display_updater.invalidate()
+                    return
+            env.process_human_input(events)
+            env.update(dt)
+            env.render()
+            display_updater.present()
+
+    def free_cell_above(self, tile_pos):
+        # The first cell from tile_pos upwards the player can stand in
+        # without starting inside a wall or a hazard
+        x, y = tile_pos
+        for dy in range(EDITOR_PLAYTEST_NUDGE + 1):
+            tile = self.tilemap.tilemap.get(f"{x};{y - dy}")
+            if tile is None or tile['type'].split()[0] not in PHYSICS_TILES | {'spikes', 'kill'}:
+                return x, y - dy
+        return None
+
+    def mouse_tile(self, mpos):
+        return (int((mpos[0] + self.scroll[0]) // self.tilemap.tile_size),
+                int((mpos[1] + self.scroll[1]) // self.tilemap.tile_size))
     
     def handle_tile_placement(self, tile_pos, mpos):
         if not self.clicking:
@@ -214,7 +536,7 @@ class Editor:
         
         tile_type = self.tile_list[self.tile_group]
         if tile_type == 'spawners' and self.count_spawners() > 0:
-            self.tilemap.extract([('spawners', 0), ('spawners', 1)], keep=False)
+            self.remove_spawners()
 
         if self.ongrid:
             if not self.canPlaceTile(mpos):
@@ -230,7 +552,8 @@ class Editor:
                 }
                 if tile_type == 'spikes':
                     tile_data['rotation'] = self.current_rotation
-                self.tilemap.tilemap[f"{tile_pos[0]};{tile_pos[1]}"] = tile_data
+                self._set_tile(tile_pos, tile_data)
+                self.autotile_edit(tile_pos)
         else:
             if tile_type in {'portal', 'finish'}:
                 return
@@ -249,7 +572,7 @@ class Editor:
                 tile_data['rotation'] = self.current_rotation
 
             elif tile_type not in PHYSICS_TILES:
-                self.tilemap.offgrid_tiles.append(tile_data)
+                self._add_offgrid(tile_data)
                 
     def save_map(self):
         directory = 'data/maps'
@@ -259,19 +582,22 @@ class Editor:
         if self.current_map_file:
             filename = os.path.basename(self.current_map_file)  
             file_path = os.path.join(directory, filename)
-            self.tilemap.save(file_path)
-            saved_map_name = filename
         else:
             next_filename = find_next_numeric_filename(directory, extension='.json')            
             file_path = os.path.join(directory, next_filename)
-            
-            self.tilemap.save(file_path)
             self.current_map_file = next_filename
-            saved_map_name = next_filename
-        
-        self.show_save_message = True
-        self.save_message_timer = 0
-        self.saved_map_name = saved_map_name        
+
+        # Only the snapshot and the quick checks happen here; writing,
+        # compiling and the completability search run on the saver's workers
+        # and poll_saves reports when they are done. A map with a problem the
+        # quick checks see is still saved, with a warning, and not searched.
+        map_data = self.tilemap.prepare_save()
+        problems = map_problems(map_data)
+        self.save_problems[file_path] = problems
+        map_saver.save(file_path, map_data, validate=not problems)
+        # Saving merges spawners into the grid
+        self.rebuild_special_index()
+        self.autosaved_revision = self.history.revision
         
         if not pygame.key.get_pressed()[pygame.K_o]:
             self.menu.return_to_menu()
@@ -292,21 +618,13 @@ class Editor:
                 tile_img.get_width(), tile_img.get_height()
             )
             if tile_r.collidepoint(mpos):
-                self.tilemap.offgrid_tiles.remove(tile)
+                self._remove_offgrid(tile)
     
     def draw_grid(self):
-        # Simplified grid drawing
         tile_size = self.tilemap.tile_size
-        
-        # Vertical lines
         start_x = -self.scroll[0] % tile_size
-        for x in range(start_x, DISPLAY_SIZE[0], tile_size):
-            pygame.draw.line(self.display, (50, 50, 50), (x, 0), (x, DISPLAY_SIZE[1]))
-            
-        # Horizontal lines
         start_y = -self.scroll[1] % tile_size
-        for y in range(start_y, DISPLAY_SIZE[1], tile_size):
-            pygame.draw.line(self.display, (50, 50, 50), (0, y), (DISPLAY_SIZE[0], y))
+        self.display.blit(self.grid_overlay, (start_x - tile_size, start_y - tile_size))
     
     def handle_mouse_events(self, event, tile_pos, mpos):
         in_menu = mpos[0] < self.menu_width
@@ -317,19 +635,62 @@ class Editor:
                     self.handle_menu_click(mpos)
                 elif self.ctrl:
                     self.rotate_spike_at_position(tile_pos)
+                    display_updater.invalidate()
+                elif self.tool != 'brush':
+                    self.start_tool(event.button, tile_pos)
                 else:
                     self.clicking = True
+                    self.history.begin_stroke()
             elif event.button == 3 and not in_menu:  # Right click
-                self.right_clicking = True
+                if self.tool != 'brush':
+                    self.start_tool(event.button, tile_pos)
+                else:
+                    self.right_clicking = True
+                    self.history.begin_stroke()
             elif event.button in [4, 5]:  # Scroll
                 self.handle_scroll(event.button, mpos, in_menu)
 
         elif event.type == pygame.MOUSEBUTTONUP:
+            if self.drag_start is not None and event.button == self.drag_button:
+                self.finish_drag(tile_pos)
             if event.button == 1:
                 self.clicking = False
             elif event.button == 3:
                 self.right_clicking = False
+            # A stroke covers everything painted until the buttons are released
+            if not self.clicking and not self.right_clicking:
+                self.history.end_stroke()
     
+    def start_tool(self, button, tile_pos):
+        erase = button == 3
+        if self.tool == 'fill':
+            self.flood_fill(tile_pos, erase=erase)
+        elif self.tool == 'select' and erase:
+            self.selection = None
+        else:
+            self.drag_start = tile_pos
+            self.drag_button = button
+
+    def finish_drag(self, tile_pos):
+        start, self.drag_start = self.drag_start, None
+        if self.tool == 'rect':
+            self.fill_rect(start, tile_pos, erase=self.drag_button == 3)
+        elif self.tool == 'select':
+            self.selection = normalize_rect(start, tile_pos)
+
+    def draw_selection(self, tile_pos):
+        # Outline of the rect being dragged, or of the current selection
+        if self.drag_start is not None:
+            rect = normalize_rect(self.drag_start, tile_pos)
+        elif self.tool == 'select' and self.selection is not None:
+            rect = self.selection
+        else:
+            return
+        size = self.tilemap.tile_size
+        screen_rect = pygame.Rect(rect[0] * size - self.scroll[0], rect[1] * size - self.scroll[1],
+                                  (rect[2] - rect[0] + 1) * size, (rect[3] - rect[1] + 1) * size)
+        display_updater.add(pygame.draw.rect(self.display, (255, 255, 0), screen_rect, 1))
+
     def handle_scroll(self, button, mpos, in_menu):
         scroll_up = button == 4
         
@@ -401,7 +762,28 @@ class Editor:
             elif event.key == pygame.K_g:
                 self.ongrid = not self.ongrid
             elif event.key == pygame.K_t:
-                self.tilemap.autotile()
+                self.autotile_all()
+                display_updater.invalidate()
+            elif event.key == pygame.K_z and self.ctrl:
+                if self.shift:
+                    self.redo()
+                else:
+                    self.undo()
+            elif event.key == pygame.K_y and self.ctrl:
+                self.redo()
+            elif event.key == pygame.K_c and self.ctrl:
+                self.copy_selection()
+            elif event.key == pygame.K_v and self.ctrl:
+                self.paste(self.mouse_tile(pygame.mouse.get_pos()))
+            elif event.key == pygame.K_DELETE and self.selection is not None:
+                self.fill_rect(self.selection[:2], self.selection[2:], erase=True)
+            elif event.key == pygame.K_p:
+                self.playtest(at_cursor=self.shift)
+            elif event.key == pygame.K_b:
+                self.tool = EDITOR_TOOLS[(EDITOR_TOOLS.index(self.tool) + 1) % len(EDITOR_TOOLS)]
+                self.drag_start = None
+            elif event.key == pygame.K_l:
+                self.live_autotile = not self.live_autotile
             elif event.key == pygame.K_o:
                 self.save_map()
             elif event.key in {pygame.K_LSHIFT, pygame.K_RSHIFT}:
@@ -441,6 +823,49 @@ class Editor:
         self.scroll[1] += (self.movement[3] - self.movement[2]) * EDITOR_SCROLL_SPEED
         return (int(self.scroll[0]), int(self.scroll[1]))
         
+    def autosave_path(self):
+        name = os.path.basename(self.current_map_file) if self.current_map_file else 'untitled.json'
+        return os.path.join(EDITOR_AUTOSAVE_DIR, name)
+
+    def autosave(self):
+        # Same background path as a save, but into the cache and without
+        # touching the map being edited
+        now = pygame.time.get_ticks()
+        if now - self.last_autosave < EDITOR_AUTOSAVE_INTERVAL or map_saver.busy():
+            return
+        self.last_autosave = now
+        if self.history.revision == self.autosaved_revision:
+            return
+        self.autosaved_revision = self.history.revision
+        map_saver.save(self.autosave_path(), self.tilemap.snapshot(), compile=False)
+
+    def poll_saves(self):
+        for path, error, warning in map_saver.completed():
+            if os.path.dirname(path) == EDITOR_AUTOSAVE_DIR:
+                continue
+            map_catalog.invalidate(path)
+            problems = self.save_problems.pop(path, None)
+            if error is None:
+                self.save_message = f"Map saved: {os.path.basename(path)}"
+                if warning is not None:
+                    problems = (problems or []) + [f"sidecar not built: {warning}"]
+                if problems:
+                    self.save_message += f" ({'; '.join(problems)})"
+            else:
+                self.save_message = f"Save failed: {error}"
+            self.show_save_message = True
+            self.save_message_timer = 0
+        # Only problems are worth interrupting for
+        for path, report, error in map_saver.reports():
+            if error is not None:
+                self.save_message = f"Map check failed: {error}"
+            elif not report.ok:
+                self.save_message = f"{os.path.basename(path)}: {report.summary()}"
+            else:
+                continue
+            self.show_save_message = True
+            self.save_message_timer = 0
+
     def draw_save_notification(self):
         if not self.show_save_message:
             return
@@ -449,9 +874,9 @@ class Editor:
         overlay.fill((0, 0, 0, 180))
         
         overlay_y = (DISPLAY_SIZE[1] - 80) // 2
-        self.display.blit(overlay, (0, overlay_y))
+        display_updater.add(self.display.blit(overlay, (0, overlay_y)))
         
-        save_text = self.save_font.render(f"Map saved: {self.saved_map_name}", True, (255, 255, 255))
+        save_text = self.save_font.render(self.save_message, True, (255, 255, 255))
         text_x = (DISPLAY_SIZE[0] - save_text.get_width()) // 2
         text_y = overlay_y + (80 - save_text.get_height()) // 2
         self.display.blit(save_text, (text_x, text_y))
@@ -474,7 +899,7 @@ class Editor:
         # Draw variants
         self._draw_variants(menu_surf)
         
-        self.display.blit(menu_surf, (0, 0))
+        display_updater.add(self.display.blit(menu_surf, (0, 0)))
     
     def _draw_tile_types(self, menu_surf):
         for i in range(min(4, len(self.tile_list))):
@@ -524,37 +949,46 @@ class Editor:
         ui_elements = [
             f"Spawners: {self.count_spawners()}/1",
             f"Type: {self.tile_list[self.tile_group]} ({self.tile_variant})",
-            f"Grid: {'On' if self.ongrid else 'Off'} (G to toggle)"
+            f"Grid: {'On' if self.ongrid else 'Off'} (G to toggle)",
+            f"Live autotile: {'On' if self.live_autotile else 'Off'} (L to toggle)",
+            f"Tool: {self.tool} (B to cycle)"
         ]
         
         for i, text in enumerate(ui_elements):
             rendered = self.font.render(text, True, (255, 255, 255))
-            self.display.blit(rendered, (ui_x, 5 + i * 20))
+            display_updater.add(self.display.blit(rendered, (ui_x, 5 + i * 20)))
         
         # Rotation info for spikes
         if self.tile_list[self.tile_group] == 'spikes':
             rotation_text = self.font.render(f"Rotation: {self.current_rotation}° (R to rotate)", True, (255, 255, 255))
-            self.display.blit(rotation_text, (ui_x, 65))
+            display_updater.add(self.display.blit(rotation_text, (ui_x, 105)))
         
         # File info
         file_text = (f"Editing: {self.current_map_file}" if self.current_map_file 
                     else "Creating new map")
         file_rendered = self.font.render(file_text, True, (255, 255, 255))
-        self.display.blit(file_rendered, (ui_x, DISPLAY_SIZE[1] - 50))
+        display_updater.add(self.display.blit(file_rendered, (ui_x, DISPLAY_SIZE[1] - 50)))
         
         # Controls
-        controls = self.font.render("ESC: Return to Menu | O: Save Map", True, (255, 255, 255))
-        self.display.blit(controls, (ui_x, DISPLAY_SIZE[1] - 30))
+        controls = self.font.render("ESC: Return to Menu | O: Save Map | Ctrl+Z/Ctrl+Y: Undo/Redo | P: Playtest", True, (255, 255, 255))
+        display_updater.add(self.display.blit(controls, (ui_x, DISPLAY_SIZE[1] - 30)))
         
     def run(self):
         while True:
             self.display.fill((20, 20, 20))
             
             render_scroll = self.update_scroll()
+            # The world only needs re-presenting when the camera moves or tiles change
+            display_updater.begin(view=(render_scroll, self.zoom))
+            if self.clicking or self.right_clicking:
+                display_updater.invalidate()
             
             # Draw grid and tilemap
             self.draw_grid()
-            self.tilemap.render(self.display, offset=render_scroll, zoom=self.zoom)
+            if self.zoom <= EDITOR_LOD_ZOOM:
+                self.lod.render(self.display, self.tilemap, offset=render_scroll)
+            else:
+                self.tilemap.render(self.display, offset=render_scroll, zoom=self.zoom)
             
             # Get current tile and mouse position
             current_tile_img = self.assets[self.tile_list[self.tile_group]][self.tile_variant].copy()
@@ -571,18 +1005,21 @@ class Editor:
             # Show tile preview and handle placement/removal outside menu
             if mpos[0] >= self.menu_width:
                 if self.ongrid:
-                    self.display.blit(current_tile_img, 
+                    display_updater.add(self.display.blit(current_tile_img, 
                                     (tile_pos[0] * self.tilemap.tile_size - self.scroll[0], 
-                                     tile_pos[1] * self.tilemap.tile_size - self.scroll[1]))
+                                     tile_pos[1] * self.tilemap.tile_size - self.scroll[1])))
                 else:
-                    self.display.blit(current_tile_img, mpos)
+                    display_updater.add(self.display.blit(current_tile_img, mpos))
             
                 self.handle_tile_placement(tile_pos, mpos)
                 self.handle_tile_removal(tile_pos, mpos)
+            self.draw_selection(tile_pos)
             
             # Draw UI elements
             self.draw_menu()
             self.draw_ui(current_tile_img)
+            self.poll_saves()
+            self.autosave()
             self.draw_save_notification()
             
             # Handle events
@@ -596,6 +1033,6 @@ class Editor:
                 
                 self.handle_mouse_events(event, tile_pos, mpos)
             
-            pygame.display.update()
+            display_updater.present()
             self.clock.tick(FPS)
             
\ No newline at end of file
@@ -1,17 +1,26 @@
 import pygame
 import os
+from concurrent.futures import ThreadPoolExecutor
 from scripts.GameManager import game_state_manager
 from scripts.constants import *
 from scripts.player import Player
 from scripts.humanagent import InputHandler
 from scripts.tilemap import Tilemap
 from scripts.GameTimer import GameTimer
+from scripts.dirtyrects import display_updater
+from scripts.audio import audio
+from scripts.observation import ObservationRenderer
+from scripts.mapformat import find_map_path
+from scripts.mapcatalog import map_catalog
 from scripts.utils import (
-    load_images, Animation, 
+    load_images,
     draw_debug_info, update_camera_smooth, MenuScreen,
     calculate_ui_constants, scale_font, get_distance_to_finish
 )
 
+# Loads the level after the current one while it is being played
+level_loader = ThreadPoolExecutor(max_workers=1)
+
 class PauseMenuScreen(MenuScreen):
     def initialize(self):
         self.title = "Game Paused"
@@ -80,15 +89,9 @@ class GameMenu:
 
     def load_next_map(self):
         current_map = game_state_manager.selected_map
-        if current_map:
-            maps_folder = os.path.join('data', 'maps')
-            map_files = sorted([f for f in os.listdir(maps_folder) if f.endswith('.json')])
-            current_index = int(os.path.basename(current_map).split('.')[0])
-            
-            if f'{current_index}.json' in map_files and current_index < len(map_files) - 1:
-                self.environment.load_map_id(current_index + 1)
-            else:
-                self.reset()
+        next_map = map_catalog.next_map(current_map) if current_map else None
+        if next_map is not None:
+            self.environment.load_map_id(next_map.id)
         else:
             self.reset()
     
@@ -104,16 +107,29 @@ class GameMenu:
             surface.blit(overlay, (0, 0))
             self.active_menu.draw(surface)
 
-from scripts.assets import AssetManager
+from scripts.assets import AssetManager, assets_for_tile_types
 from scripts.stars import Stars
 
 class Environment:
-    def __init__(self, display, clock, ai_train_mode=False):
+    def __init__(self, display, clock, ai_train_mode=False, playtest_map=None, spawn=None):
         self.player_type = game_state_manager.player_type
-        self.ai_train_mode = ai_train_mode if not self.player_type == 1 else True
+        # Playtests run map data from the editor and never leave that level
+        self.playtest = playtest_map is not None
+        # The menu's AI player type applies to normal play; a playtest always
+        # takes the mode it was asked for
+        if self.playtest:
+            self.ai_train_mode = ai_train_mode
+        else:
+            self.ai_train_mode = ai_train_mode if not self.player_type == 1 else True
         self.display = display
         self.clock = clock
         self.menu = False
+
+        # The world is drawn at RENDER_SIZE and scaled up to the display once per frame
+        if RENDER_SIZE == display.get_size():
+            self.world = display
+        else:
+            self.world = pygame.Surface(RENDER_SIZE).convert()
         
         # Game state variables
         self.death_sound_played = False
@@ -124,10 +140,8 @@ class Environment:
         self.scroll = [0, 0]
         self.render_scroll = [0, 0]
         self.rotated_assets = {}
+        self.observation_renderer = None
         
-        # Music state variables
-        self.music_playing = False
-        self.music_paused = False
 
         # Initialize fonts only if not in AI mode
         if not self.ai_train_mode:
@@ -144,6 +158,8 @@ class Environment:
         self.asset_manager = AssetManager()
         self.assets = self.asset_manager.assets
         self.sfx = self.asset_manager.sfx
+        # (path, future) of the level being prepared on the loader thread
+        self.prefetched_map = None
 
         if not self.ai_train_mode:
             star_images = load_images('stars', scale=IMGSCALE)
@@ -151,7 +167,10 @@ class Environment:
         else:
             self.stars = None
 
-        self.load_current_map()
+        if self.playtest:
+            self.load_playtest(playtest_map, spawn)
+        else:
+            self.load_current_map()
         
         # Only initialize input handler and menu for human players
         if not self.ai_train_mode:
@@ -163,31 +182,23 @@ class Environment:
             self.game_menu = None
 
     def start_music(self):      
-        if not self.ai_train_mode and not self.music_playing:
-            pygame.mixer.music.load(MUSIC_PATH)
-            pygame.mixer.music.set_volume(MUSIC_VOLUME)
-            pygame.mixer.music.play(-1)  # Loop indefinitely
-            self.music_playing = True
-            self.music_paused = False
+        if not self.ai_train_mode:
+            audio.play_music(MUSIC_PATH, MUSIC_VOLUME)
            
     def play_music(self):     
         self.start_music()
 
     def pause_music(self):
-        if not self.ai_train_mode and self.music_playing and not self.music_paused:
-            pygame.mixer.music.pause()
-            self.music_paused = True
+        if not self.ai_train_mode:
+            audio.pause_music()
                                
     def resume_music(self):     
-        if not self.ai_train_mode and self.music_playing and self.music_paused:
-            pygame.mixer.music.unpause()
-            self.music_paused = False
+        if not self.ai_train_mode:
+            audio.resume_music()
 
     def stop_music(self):
-        if not self.ai_train_mode and self.music_playing:
-            pygame.mixer.music.stop()
-            self.music_playing = False
-            self.music_paused = False
+        if not self.ai_train_mode:
+            audio.stop_music()
 
     def update_timer(self):
         # Start timer and music on first movement
@@ -210,7 +221,7 @@ class Environment:
     
     def render_timer(self):
         if self.ai_train_mode or not self.timer_font:
-            return
+            return None
 
         pos = (25, 10)
         time_str = self.timer.get_formatted_time()
@@ -219,8 +230,8 @@ class Environment:
         rendered_text = self.timer_font.render(time_str, True, (255, 255, 255))
         shadow = self.timer_font.render(time_str, True, (0, 0, 0))
 
-        self.display.blit(shadow, (pos[0] + 2, pos[1] + 2))
-        self.display.blit(rendered_text, pos)
+        shadow_rect = self.display.blit(shadow, (pos[0] + 2, pos[1] + 2))
+        return self.display.blit(rendered_text, pos).union(shadow_rect)
 
     def reset_timer(self):
         self.timer.reset()
@@ -228,29 +239,88 @@ class Environment:
 
     def load_current_map(self):
         map_path = game_state_manager.selected_map
-        self.tilemap.load(map_path)
-        
+        self.load_tilemap(map_path)
+        self.start_level()
+        self.prefetch_next_map()
+
+    def load_playtest(self, map_data, spawn=None):
+        # map_data is a snapshot (Tilemap.snapshot) the tilemap may consume;
+        # spawn, in world pixels, overrides the map's spawner
+        self.tilemap.load_data(map_data)
+        self.start_level(spawn)
+        self.reset_timer()
+        self.death_sound_played = False
+        self.finish_sound_played = False
+        self.countframes = 0
+        self.menu = False
+
+    def start_level(self, spawn=None):
         # Only reset animations that need it
-        finish_scale = (self.tilemap.tile_size, self.tilemap.tile_size * 2)
-        self.assets['finish'] = Animation(
-            load_images('tiles/finish', scale=finish_scale), 
-            img_dur=5, loop=True
-        )
+        self.assets['finish'] = self.assets['finish_animation'].copy()
         
         # Setup player spawn
-        self.pos = self.tilemap.extract([(SPAWNER, 0), (SPAWNER, 1)])
-        self.default_pos = self.pos[0]['pos'].copy() if self.pos else [10, 10]
+        self.pos = self.tilemap.spawners
+        if spawn is not None:
+            self.default_pos = list(spawn)
+        else:
+            self.default_pos = self.pos[0]['pos'].copy() if self.pos else [10, 10]
         self.player = Player(self, self.default_pos.copy(), (PLAYERS_SIZE[0], PLAYERS_SIZE[1]), self.sfx)
         
         self.center_scroll_on_player()
         self.keys = {'left': False, 'right': False, 'jump': False}
         self.buffer_times = {'jump': 0}
+        display_updater.invalidate()
+
+    def load_tilemap(self, map_path):
+        # Swap in the prefetched level when it is the one asked for
+        prefetched, self.prefetched_map = self.prefetched_map, None
+        loaded = None
+        if prefetched is not None and prefetched[0] == os.path.normpath(map_path):
+            try:
+                loaded = prefetched[1].result()
+            except Exception:
+                # The map changed or broke since it was prefetched; loading
+                # it here reports the problem the way a plain load would
+                pass
+        if loaded is not None:
+            self.tilemap.take_over(loaded)
+        else:
+            self.tilemap.load(map_path)
+        self.asset_manager.prefetch(assets_for_tile_types(self.tilemap.used_types()))
+
+    def prefetch_next_map(self):
+        # Parse and preprocess the following level in the background so
+        # finishing this one only exchanges prepared structures
+        current_map = game_state_manager.selected_map
+        next_map = map_catalog.next_map(current_map) if current_map else None
+        if next_map is None and self.ai_train_mode:
+            # Training loops back to the first map
+            next_map = map_catalog.get(find_map_path(0))
+        if next_map is None:
+            self.prefetched_map = None
+            return
+        path = os.path.normpath(next_map.path)
+        if self.prefetched_map is None or self.prefetched_map[0] != path:
+            self.prefetched_map = (path, level_loader.submit(self.prepare_map, path))
+
+    def prepare_map(self, map_path):
+        # Runs on the loader thread; nothing here touches the display
+        tilemap = Tilemap(self, tile_size=TILE_SIZE)
+        tilemap.load(map_path)
+        self.asset_manager.prefetch(assets_for_tile_types(tilemap.used_types()))
+        return tilemap
     
     def center_scroll_on_player(self):
         player_rect = self.player.rect()
-        self.scroll[0] = player_rect.centerx - self.display.get_width() // 2
-        self.scroll[1] = player_rect.centery - self.display.get_height() // 2
+        self.scroll[0] = player_rect.centerx - self.world.get_width() // 2
+        self.scroll[1] = player_rect.centery - self.world.get_height() // 2
         self.render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
+        self.stream_map()
+
+    def stream_map(self):
+        # Large maps only keep the chunks around the player and camera decoded
+        camera_center = (self.scroll[0] + self.world.get_width() // 2, self.scroll[1] + self.world.get_height() // 2)
+        self.tilemap.stream_around(self.player.rect().center, camera_center)
     
     def reset(self):
         # Reset all state variables
@@ -273,34 +343,37 @@ class Environment:
         # Reset timer and camera
         self.reset_timer()
         self.center_scroll_on_player()
+        display_updater.invalidate()
         
         # Resume music if it was paused (but don't restart if it was stopped)
-        if not self.ai_train_mode and self.music_paused:
+        if not self.ai_train_mode and audio.music_paused:
             self.resume_music()
 
     def restart_game(self):
         self.load_map_id(0)
 
     def load_map_id(self, map_id):
-        next_map = f'data/maps/{map_id}.json'
+        next_map = find_map_path(map_id)
         game_state_manager.selected_map = next_map
         self.reset()
-        self.tilemap.load(next_map)
+        self.load_tilemap(next_map)
         
         # Reset the finish animation
-        self.assets['finish'] = Animation(load_images('tiles/finish', scale=FINISHSCALE), img_dur=5, loop=True)
+        self.assets['finish'] = self.assets['finish_animation'].copy()
         
         # Update spawn position
-        self.pos = self.tilemap.extract([(SPAWNER, 0), (SPAWNER, 1)])
+        self.pos = self.tilemap.spawners
         self.default_pos = self.pos[0]['pos'].copy() if self.pos else [10, 10]
         self.player.pos = self.default_pos.copy()
         
         self.reset_timer()
         self.center_scroll_on_player()
         self.menu = False
+        display_updater.invalidate()
+        self.prefetch_next_map()
         
         # Ensure music is playing when loading a new map (if not in AI mode)
-        if not self.ai_train_mode and not self.music_playing:
+        if not self.ai_train_mode and not audio.music_playing:
             self.start_music()
     
     def return_to_main(self):
@@ -309,26 +382,14 @@ class Environment:
         game_state_manager.returnToPrevState()
 
     def is_last_map(self):
-        current_map = game_state_manager.selected_map
-        current_index = int(os.path.basename(current_map).split('.')[0])
-        
-        maps_folder = os.path.join('data', 'maps')
-        map_files = [f for f in os.listdir(maps_folder) if f.endswith('.json')]
-        
         # Return True if this is the LAST map (no more maps after this one)
-        return current_index >= len(map_files) - 1
+        return map_catalog.is_last_map(game_state_manager.selected_map)
 
     def load_next_map(self):
         current_map = game_state_manager.selected_map
-        if current_map:
-            maps_folder = os.path.join('data', 'maps')
-            map_files = sorted([f for f in os.listdir(maps_folder) if f.endswith('.json')])
-            current_index = int(os.path.basename(current_map).split('.')[0])
-            
-            if f'{current_index}.json' in map_files and current_index < len(map_files) - 1:
-                self.load_map_id(current_index + 1)
-            else:
-                self.reset()
+        next_map = map_catalog.next_map(current_map) if current_map else None
+        if next_map is not None:
+            self.load_map_id(next_map.id)
         else:
             self.reset()
     
@@ -378,6 +439,9 @@ class Environment:
             
             completion_frames = 30 if self.ai_train_mode else 90
             if self.countframes >= completion_frames:
+                if self.playtest:
+                    self.reset()
+                    return True
                 if self.ai_train_mode:
                     if self.is_last_map():
                         self.load_map_id(0) 
@@ -395,39 +459,49 @@ class Environment:
             self.player.update(self.tilemap, self.keys, self.countframes)
             
             if not self.ai_train_mode:
-                update_camera_smooth(self.player, self.scroll, self.display.get_width(), self.display.get_height())
+                update_camera_smooth(self.player, self.scroll, self.world.get_width(), self.world.get_height())
             else:
                 player_rect = self.player.rect()
-                self.scroll[0] = player_rect.centerx - self.display.get_width() // 2
-                self.scroll[1] = player_rect.centery - self.display.get_height() // 2
+                self.scroll[0] = player_rect.centerx - self.world.get_width() // 2
+                self.scroll[1] = player_rect.centery - self.world.get_height() // 2
                 
             self.render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
+            self.stream_map()
     
         return False
 
     def render(self):
-        self.display.fill((8, 10, 38))
+        self.world.fill((8, 10, 38))
 
         if self.ai_train_mode:
             distance, player_pos, finish_pos = get_distance_to_finish(self)
-            self.tilemap.render_ai(self.display, offset=self.render_scroll, distance=distance, player_pos=player_pos, finish_pos=finish_pos)
-            self.player.render_ai(self.display, offset=self.render_scroll)
+            self.tilemap.render_ai(self.world, offset=self.render_scroll, distance=distance, player_pos=player_pos, finish_pos=finish_pos)
+            self.player.render_ai(self.world, offset=self.render_scroll)
+            self.present_world()
         else:
+            # While the camera holds still only the moving parts reach the display
+            display_updater.begin(view=self.render_scroll)
+            world_rects = []
             if self.stars:
-                self.stars.render(self.display, offset=self.render_scroll)
-            self.tilemap.render(surf=self.display, offset=self.scroll)
-            self.player.render(self.display, offset=self.render_scroll) 
-
-            fps = self.clock.get_fps()
-            fps_text = self.fps_font.render(f"{int(fps)}", True, (200, 120, 255))
-            self.display.blit(fps_text, (DISPLAY_SIZE[0]*0.95, 10))
-            self.render_timer()
-            
+                world_rects.extend(self.stars.render(self.world, offset=self.render_scroll))
+            world_rects.extend(self.tilemap.render(surf=self.world, offset=self.scroll))
+            world_rects.append(self.player.render(self.world, offset=self.render_scroll))
 
             if self.debug_mode and not self.menu:
                 self.debug_render()
+                display_updater.invalidate()
+
+            self.present_world()
+            display_updater.add_all(self.world_to_display_rect(rect) for rect in world_rects)
+
+            # HUD stays at native resolution
+            fps = self.clock.get_fps()
+            fps_text = self.fps_font.render(f"{int(fps)}", True, (200, 120, 255))
+            display_updater.add(self.display.blit(fps_text, (DISPLAY_SIZE[0]*0.95, 10)))
+            display_updater.add(self.render_timer())
             
             if self.menu:
+                display_updater.invalidate()
                 mouse_pos = pygame.mouse.get_pos()
                 if self.game_menu.active_menu:
                     for button in self.game_menu.active_menu.buttons:
@@ -435,6 +509,23 @@ class Environment:
                         
                 self.game_menu.draw(self.display)
 
+    def present_world(self):
+        if self.world is self.display:
+            return
+        if RENDER_FILTER == 'smooth':
+            pygame.transform.smoothscale(self.world, self.display.get_size(), self.display)
+        else:
+            pygame.transform.scale(self.world, self.display.get_size(), self.display)
+
+    def world_to_display_rect(self, rect):
+        if self.world is self.display:
+            return rect
+        sx = self.display.get_width() / self.world.get_width()
+        sy = self.display.get_height() / self.world.get_height()
+        # Smooth filtering bleeds into neighbouring pixels
+        return pygame.Rect(int(rect.x * sx), int(rect.y * sy),
+                           int(rect.width * sx) + 2, int(rect.height * sy) + 2).inflate(2, 2)
+
     def process_menu_events(self, events):
         if self.ai_train_mode:
             return
@@ -455,9 +546,15 @@ class Environment:
         if self.ai_train_mode:
             return
             
-        draw_debug_info(self, self.display, self.render_scroll)  
+        draw_debug_info(self, self.world, self.render_scroll)  
 
         
+    def observation(self, grayscale=False):
+        # Egocentric low-resolution pixel view for vision agents, no window needed
+        if self.observation_renderer is None or self.observation_renderer.grayscale != grayscale:
+            self.observation_renderer = ObservationRenderer(self.tilemap, grayscale=grayscale)
+        return self.observation_renderer.render(self.player.rect().center, self.player.size)
+
     def state(self):     
         state_data = []
         
@@ -0,0 +1,133 @@
+import numpy as np
+import pygame
+from scripts.constants import *
+from scripts.tilemap import pack_cells, unpack_cells
+
+# Level of detail for far zoom: each grid tile becomes one pixel of its
+# type's average colour, kept per chunk and scaled up to the tile size.
+# Black is the transparent colour, so no tile colour may be pure black.
+LOD_EMPTY = (0, 0, 0)
+LOD_UNKNOWN = (128, 128, 128)
+
+
+def average_color(images):
+    # Mean colour of the opaque pixels of a tile type's variants
+    total, count = np.zeros(3), 0
+    for img in images:
+        rgb = pygame.surfarray.array3d(img).reshape(-1, 3).astype(np.float64)
+        colorkey = img.get_colorkey()
+        if colorkey is not None:
+            rgb = rgb[np.any(rgb != colorkey[:3], axis=1)]
+        total += rgb.sum(axis=0)
+        count += len(rgb)
+    color = total / count if count else np.full(3, 128.0)
+    return tuple(int(c) for c in np.clip(np.round(color), 1, 255))
+
+
+class LODRenderer:
+    def __init__(self, assets, chunk_size=MAP_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.type_ids = {tile_type: i + 1 for i, tile_type in enumerate(assets)}
+        self.palette = np.array(
+            [LOD_EMPTY] + [average_color(assets[t]) for t in assets] + [LOD_UNKNOWN], dtype=np.uint8
+        )
+        # (cx, cy) -> (chunk_size, chunk_size) array of palette ids, indexed [x, y]
+        self.chunks = None
+        # (cx, cy) -> Surface scaled to scaled_tile_size; dropped when the chunk changes
+        self.surfaces = {}
+        self.scaled_tile_size = None
+
+    def invalidate(self):
+        # Rebuilt from the tilemap the next time it is drawn
+        self.chunks = None
+        self.surfaces = {}
+
+    def _type_id(self, tile_type):
+        return self.type_ids.get(tile_type.split()[0], len(self.palette) - 1)
+
+    def build(self, tilemap):
+        # Tiles are grouped by chunk with one sort, then each chunk is
+        # filled with a single fancy-indexing write
+        self.chunks = {}
+        self.surfaces = {}
+        if not tilemap:
+            return
+        tiles = list(tilemap.values())
+        xs = np.fromiter((tile[POS][0] for tile in tiles), dtype=np.int64, count=len(tiles))
+        ys = np.fromiter((tile[POS][1] for tile in tiles), dtype=np.int64, count=len(tiles))
+        ids = np.fromiter((self._type_id(tile[TYPE]) for tile in tiles), dtype=np.uint8, count=len(tiles))
+        cxs, cys = xs // self.chunk_size, ys // self.chunk_size
+        order = np.lexsort((cys, cxs))
+        keys = np.stack((cxs[order], cys[order]), axis=1)
+        starts = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        for group in np.split(order, starts):
+            cx, cy = int(cxs[group[0]]), int(cys[group[0]])
+            cells = np.zeros((self.chunk_size, self.chunk_size), dtype=np.uint8)
+            cells[xs[group] % self.chunk_size, ys[group] % self.chunk_size] = ids[group]
+            self.chunks[(cx, cy)] = cells
+
+    def set_cell(self, pos, tile_type):
+        # Keep a built LOD in step with a single edit; tile_type None clears
+        if self.chunks is None:
+            return
+        x, y = int(pos[0]), int(pos[1])
+        key = (x // self.chunk_size, y // self.chunk_size)
+        cells = self.chunks.get(key)
+        if cells is None:
+            if tile_type is None:
+                return
+            cells = self.chunks[key] = np.zeros((self.chunk_size, self.chunk_size), dtype=np.uint8)
+        cells[x % self.chunk_size, y % self.chunk_size] = 0 if tile_type is None else self._type_id(tile_type)
+        self.surfaces.pop(key, None)
+
+    def set_cells(self, positions, tile_types):
+        # Batched set_cell: one masked write per touched chunk
+        if self.chunks is None or not positions:
+            return
+        xy = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        type_ids = {t: 0 if t is None else self._type_id(t) for t in set(tile_types)}
+        ids = np.array([type_ids[t] for t in tile_types], dtype=np.uint8)
+        keys = pack_cells(xy // self.chunk_size)
+        chunk_keys = np.unique(keys)
+        for key, cx, cy in zip(chunk_keys.tolist(), *(axis.tolist() for axis in unpack_cells(chunk_keys))):
+            inside = keys == key
+            cells = self.chunks.get((cx, cy))
+            if cells is None:
+                cells = self.chunks[(cx, cy)] = np.zeros((self.chunk_size, self.chunk_size), dtype=np.uint8)
+            local = xy[inside] % self.chunk_size
+            cells[local[:, 0], local[:, 1]] = ids[inside]
+            self.surfaces.pop((cx, cy), None)
+
+    def _surface(self, key, tile_size):
+        surface = self.surfaces.get(key)
+        if surface is None:
+            image = pygame.surfarray.make_surface(self.palette[self.chunks[key]])
+            size = self.chunk_size * tile_size
+            surface = pygame.transform.scale(image, (size, size)).convert()
+            surface.set_colorkey(LOD_EMPTY)
+            self.surfaces[key] = surface
+        return surface
+
+    def render(self, surf, tilemap, offset=(0, 0)):
+        # Draws the grid tiles of tilemap at its current tile size; one blit
+        # per visible chunk however many tiles it holds
+        if self.chunks is None:
+            self.build(tilemap.tilemap)
+        tile_size = tilemap.tile_size
+        if tile_size != self.scaled_tile_size:
+            self.surfaces = {}
+            self.scaled_tile_size = tile_size
+        # Offgrid tiles are few; they are drawn as plain tile-sized squares
+        for tile in tilemap.offgrid_tiles:
+            color = tuple(self.palette[self._type_id(tile[TYPE])].tolist())
+            x, y = tile[POS][0] * tile_size - offset[0], tile[POS][1] * tile_size - offset[1]
+            surf.fill(color, (x, y, tile_size, tile_size))
+
+        span = self.chunk_size * tile_size
+        start_x, start_y = int(offset[0] // span), int(offset[1] // span)
+        end_x = int((offset[0] + surf.get_width()) // span)
+        end_y = int((offset[1] + surf.get_height()) // span)
+        for cx in range(start_x, end_x + 1):
+            for cy in range(start_y, end_y + 1):
+                if (cx, cy) in self.chunks:
+                    surf.blit(self._surface((cx, cy), tile_size), (cx * span - offset[0], cy * span - offset[1]))
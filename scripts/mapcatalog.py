@@ -0,0 +1,127 @@
+import os
+from pathlib import Path
+from scripts.constants import *
+from scripts.mapformat import is_binary_map, read_header, load_map_data, BINARY_MAP_HEADER
+
+
+def map_number(filename):
+    # Maps are ordered by their numeric id; anything else sorts last
+    try:
+        return int(Path(filename).stem)
+    except ValueError:
+        return float('inf')
+
+
+class MapEntry:
+    def __init__(self, path, stat):
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.id = map_number(self.filename)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime_ns
+        self.details = None
+        # Cached preview image, filled in by the thumbnail service
+        self.thumbnail = None
+
+    def tile_counts(self):
+        return self._details()['tile_counts']
+
+    def bounds(self):
+        return self._details()['bounds']
+
+    def _details(self):
+        # Tile counts and bounds are read on first use and kept until the
+        # file changes; binary maps answer from their header alone
+        if self.details is None:
+            if is_binary_map(self.path):
+                with open(self.path, 'rb') as f:
+                    header = read_header(f.read(BINARY_MAP_HEADER.size))
+                counts = (header['grid_count'], header['offgrid_count'])
+                bounds = header['bounds']
+            else:
+                map_data = load_map_data(self.path)
+                positions = [tile[POS] for tile in map_data[TILEMAP].values()]
+                counts = (len(positions), len(map_data[OFFGRID]))
+                if positions:
+                    xs, ys = [pos[0] for pos in positions], [pos[1] for pos in positions]
+                    bounds = (min(xs), min(ys), max(xs), max(ys))
+                else:
+                    bounds = (0, 0, 0, 0)
+            self.details = {'tile_counts': counts, 'bounds': bounds}
+        return self.details
+
+
+class MapCatalog:
+    def __init__(self, directory=MAPS_DIR):
+        self.directory = directory
+        self.dir_mtime = None
+        self.entries = []
+        self.by_filename = {}
+        self.positions = {}
+
+    def refresh(self, force=False):
+        # One stat of the directory per query; the listing is only rebuilt
+        # when a map was added, removed or replaced
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        dir_mtime = os.stat(self.directory).st_mtime_ns
+        if not force and dir_mtime == self.dir_mtime:
+            return
+        self.dir_mtime = dir_mtime
+
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for item in scan:
+                if item.is_file() and item.name.endswith(MAP_EXTENSIONS):
+                    old = self.by_filename.get(item.name)
+                    stat = item.stat()
+                    if old is not None and old.mtime == stat.st_mtime_ns and old.size == stat.st_size:
+                        entries.append(old)
+                    else:
+                        entries.append(MapEntry(os.path.join(self.directory, item.name), stat))
+        entries.sort(key=lambda entry: (entry.id, MAP_EXTENSIONS.index(Path(entry.filename).suffix)))
+        # A map saved in several formats is listed once, in the format
+        # find_map_path picks for its id; the other copies stand for it
+        listed, winners = [], {}
+        for entry in entries:
+            stem = Path(entry.filename).stem
+            if stem not in winners:
+                winners[stem] = len(listed)
+                listed.append(entry)
+        self.entries = listed
+        self.by_filename = {entry.filename: entry for entry in entries}
+        self.positions = {entry.filename: winners[Path(entry.filename).stem] for entry in entries}
+
+    def invalidate(self, path=None):
+        # Saving over an existing map does not touch the directory mtime
+        if path is not None:
+            self.by_filename.pop(os.path.basename(path), None)
+        self.dir_mtime = None
+
+    def maps(self):
+        self.refresh()
+        return self.entries
+
+    def filenames(self):
+        return [entry.filename for entry in self.maps()]
+
+    def get(self, path):
+        self.refresh()
+        return self.by_filename.get(os.path.basename(path))
+
+    def index_of(self, path):
+        self.refresh()
+        return self.positions.get(os.path.basename(path))
+
+    def next_map(self, path):
+        # The entry played after path, or None when path is the last map
+        index = self.index_of(path)
+        if index is None or index + 1 >= len(self.entries):
+            return None
+        return self.entries[index + 1]
+
+    def is_last_map(self, path):
+        return self.next_map(path) is None
+
+
+map_catalog = MapCatalog()
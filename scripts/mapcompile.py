@@ -0,0 +1,108 @@
+import hashlib
+import os
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+import numpy as np
+from scripts.constants import *
+from scripts.mapformat import map_to_records, records_to_map
+
+# Compiled maps: everything the game derives from a map on load, baked into
+# an .npz next to it and stamped with the hash of the source file. A fresh
+# sidecar turns loading into a handful of array reads.
+COMPILED_MAP_VERSION = 2
+
+SPAWNER_IDS = [(SPAWNER, 0), (SPAWNER, 1)]
+
+
+def compiled_map_path(map_path):
+    return str(Path(map_path).with_suffix(COMPILED_MAP_SUFFIX))
+
+
+def source_hash(map_path):
+    with open(map_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def compile_tilemap(tilemap, spawners, content_hash):
+    # tilemap holds the tiles exactly as the game plays them: spawners merged
+    # and extracted, autotiled if COMPILE_AUTOTILE
+    type_names, grid, offgrid = map_to_records({TILEMAP: tilemap.tilemap, OFFGRID: tilemap.offgrid_tiles})
+    return {
+        'version': np.int32(COMPILED_MAP_VERSION),
+        'source_hash': np.array(content_hash),
+        'tile_size': np.int32(tilemap.tile_size),
+        'autotiled': np.bool_(COMPILE_AUTOTILE),
+        'type_names': np.array(type_names, dtype=str),
+        'grid': grid,
+        'offgrid': offgrid,
+        'spawners': np.array(
+            [(spawner[VARIANT], spawner[POS][0], spawner[POS][1]) for spawner in spawners], dtype=np.float64
+        ).reshape(-1, 3),
+        'lowest_y': np.int32(tilemap.lowest_y),
+    }
+
+
+def save_compiled_map(map_path, arrays):
+    # Written to a temporary file first so readers never see half a sidecar;
+    # the name is unique so concurrent bakes of one map cannot collide
+    path = compiled_map_path(map_path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class CompiledMap:
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.lowest_y = int(arrays['lowest_y'])
+
+    def map_data(self):
+        return records_to_map(
+            self.arrays['type_names'].tolist(), self.arrays['grid'], self.arrays['offgrid'], self.lowest_y
+        )
+
+    def spawners(self):
+        # Same shape as the matches Tilemap.extract returns
+        def number(value):
+            return int(value) if value.is_integer() else value
+        return [
+            {TYPE: SPAWNER, VARIANT: int(variant), POS: [number(x), number(y)]}
+            for variant, x, y in self.arrays['spawners'].tolist()
+        ]
+
+
+def load_compiled_map(map_path, tile_size):
+    # The sidecar for map_path, or None when it is missing or stale
+    path = compiled_map_path(map_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        fresh = (
+            int(arrays['version']) == COMPILED_MAP_VERSION
+            and int(arrays['tile_size']) == tile_size
+            and bool(arrays['autotiled']) == COMPILE_AUTOTILE
+            and str(arrays['source_hash']) == source_hash(map_path)
+        )
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+    return CompiledMap(arrays) if fresh else None
+
+
+if __name__ == '__main__':
+    from scripts.tilemap import Tilemap
+
+    paths = sys.argv[1:] or sorted(
+        os.path.join(MAPS_DIR, name) for name in os.listdir(MAPS_DIR) if name.endswith(MAP_EXTENSIONS)
+    )
+    for path in paths:
+        Tilemap(None, TILE_SIZE, env=False).compile(path)
+        print(f"{path} -> {compiled_map_path(path)}")
@@ -0,0 +1,357 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from pathlib import Path
+import numpy as np
+from scripts.constants import *
+
+# Binary maps: fixed header, tile type name table, chunk index, then packed
+# grid and offgrid records grouped by chunk. Everything a JSON map holds
+# round-trips unchanged. Version 1 files have no chunk index; versions before
+# 3 do not record which offgrid coordinates were integers.
+BINARY_MAP_MAGIC = b'ASMP'
+BINARY_MAP_VERSION = 3
+BINARY_MAP_HEADER = struct.Struct('<4sHHiiiiiIII20s')
+# chunk size, chunk count, spawn tile, finish tile
+CHUNK_INDEX_HEADER = struct.Struct('<HIiiii')
+
+FLAG_HAS_SPAWN = 1
+FLAG_HAS_FINISH = 2
+
+NO_ROTATION = -1
+
+GRID_DTYPE = np.dtype([
+    ('x', '<i4'), ('y', '<i4'), ('type', 'u1'), ('variant', '<u2'), ('rotation', '<i2'),
+])
+# ints: bit 0 set when x was an integer, bit 1 when y was
+OFFGRID_DTYPE = np.dtype([
+    ('x', '<f8'), ('y', '<f8'), ('type', 'u1'), ('variant', '<u2'), ('rotation', '<i2'), ('ints', 'u1'),
+])
+OFFGRID_DTYPE_V2 = np.dtype([
+    ('x', '<f8'), ('y', '<f8'), ('type', 'u1'), ('variant', '<u2'), ('rotation', '<i2'),
+])
+INT_X = 1
+INT_Y = 2
+CHUNK_DTYPE = np.dtype([
+    ('cx', '<i4'), ('cy', '<i4'),
+    ('grid_start', '<u4'), ('grid_count', '<u4'),
+    ('offgrid_start', '<u4'), ('offgrid_count', '<u4'),
+])
+
+
+class MapFormatError(ValueError):
+    pass
+
+
+def _records(tiles, dtype, type_ids):
+    records = np.zeros(len(tiles), dtype=dtype)
+    if tiles:
+        records['x'] = [tile[POS][0] for tile in tiles]
+        records['y'] = [tile[POS][1] for tile in tiles]
+        records['type'] = [type_ids[tile[TYPE]] for tile in tiles]
+        records['variant'] = [tile[VARIANT] for tile in tiles]
+        records['rotation'] = [tile.get(ROTATION, NO_ROTATION) for tile in tiles]
+        if 'ints' in dtype.names:
+            records['ints'] = [
+                (INT_X if isinstance(tile[POS][0], int) else 0) | (INT_Y if isinstance(tile[POS][1], int) else 0)
+                for tile in tiles
+            ]
+    return records
+
+
+def _coords(records, axis, flag):
+    # Offgrid coordinates come back as the int or float they were saved as
+    values = records[axis].tolist()
+    if 'ints' not in records.dtype.names:
+        return values
+    ints = (records['ints'] & flag).tolist()
+    return [int(v) if is_int else v for v, is_int in zip(values, ints)]
+
+
+def _tiles(records, type_names, cast):
+    # Plain comprehensions over tolist() columns; per-tile dict creation is
+    # the bulk of the decode cost
+    if cast is int:
+        xs, ys = records['x'].tolist(), records['y'].tolist()
+    else:
+        xs, ys = _coords(records, 'x', INT_X), _coords(records, 'y', INT_Y)
+    types = np.array(type_names, dtype=object)[records['type']].tolist() if len(records) else []
+    variants = records['variant'].tolist()
+    tiles = [{TYPE: t, VARIANT: v, POS: [x, y]} for t, v, x, y in zip(types, variants, xs, ys)]
+    for i in np.flatnonzero(records['rotation'] != NO_ROTATION).tolist():
+        tiles[i][ROTATION] = int(records['rotation'][i])
+    return tiles
+
+
+def _content_hash(type_table, grid, offgrid, lowest_y):
+    digest = hashlib.sha1(type_table)
+    digest.update(grid.tobytes())
+    digest.update(offgrid.tobytes())
+    digest.update(struct.pack('<i', lowest_y))
+    return digest.digest()
+
+
+def _chunk_keys(records, chunk_size):
+    cx = np.floor_divide(np.floor(records['x']).astype(np.int64), chunk_size)
+    cy = np.floor_divide(np.floor(records['y']).astype(np.int64), chunk_size)
+    return cx, cy
+
+
+def _group_by_chunk(records, chunk_size):
+    # Stable sort so tiles keep their authored order inside a chunk
+    cx, cy = _chunk_keys(records, chunk_size)
+    order = np.lexsort((cy, cx))
+    return records[order], cx[order], cy[order]
+
+
+def _chunk_runs(cx, cy):
+    # (start, count) of each chunk's run of records, keyed by chunk
+    runs = {}
+    if len(cx):
+        breaks = np.flatnonzero((np.diff(cx) != 0) | (np.diff(cy) != 0)) + 1
+        starts = np.concatenate(([0], breaks)).tolist()
+        ends = np.concatenate((breaks, [len(cx)])).tolist()
+        for start, end in zip(starts, ends):
+            runs[(int(cx[start]), int(cy[start]))] = (start, end - start)
+    return runs
+
+
+def _first_spawn(grid_tiles, offgrid_tiles):
+    # Same search order as Tilemap.extract: offgrid tiles first, then the grid
+    for tile in offgrid_tiles + grid_tiles:
+        if tile[TYPE].split()[0] == SPAWNER and tile[VARIANT] in (0, 1):
+            return int(tile[POS][0]), int(tile[POS][1])
+    return None
+
+
+def _first_finish(grid_tiles):
+    for tile in grid_tiles:
+        if tile[TYPE].startswith('finish'):
+            return tile[POS][0], tile[POS][1]
+    return None
+
+
+def map_to_records(map_data):
+    # Tile type names plus grid and offgrid record arrays, in map order
+    grid_tiles = list(map_data[TILEMAP].values())
+    offgrid_tiles = list(map_data[OFFGRID])
+    type_names = sorted({tile[TYPE] for tile in grid_tiles} | {tile[TYPE] for tile in offgrid_tiles})
+    if len(type_names) > 255:
+        raise MapFormatError("too many tile types for a binary map")
+    type_ids = {name: i for i, name in enumerate(type_names)}
+    return (
+        type_names,
+        _records(grid_tiles, GRID_DTYPE, type_ids),
+        _records(offgrid_tiles, OFFGRID_DTYPE, type_ids),
+    )
+
+
+def records_to_map(type_names, grid, offgrid, lowest_y=0):
+    return {
+        TILEMAP: _grid_dict(grid, type_names),
+        OFFGRID: _tiles(offgrid, type_names, float),
+        LOWEST_Y: lowest_y,
+    }
+
+
+def encode_map(map_data, chunk_size=MAP_CHUNK_SIZE):
+    grid_tiles = list(map_data[TILEMAP].values())
+    offgrid_tiles = list(map_data[OFFGRID])
+    lowest_y = int(map_data.get(LOWEST_Y, 0))
+
+    type_names, grid, offgrid = map_to_records(map_data)
+    type_table = b''.join(bytes([len(name.encode())]) + name.encode() for name in type_names)
+
+    grid, grid_cx, grid_cy = _group_by_chunk(grid, chunk_size)
+    offgrid, off_cx, off_cy = _group_by_chunk(offgrid, chunk_size)
+
+    grid_runs = _chunk_runs(grid_cx, grid_cy)
+    offgrid_runs = _chunk_runs(off_cx, off_cy)
+    keys = sorted(grid_runs.keys() | offgrid_runs.keys())
+    chunks = np.zeros(len(keys), dtype=CHUNK_DTYPE)
+    for i, key in enumerate(keys):
+        chunks[i] = (*key, *grid_runs.get(key, (0, 0)), *offgrid_runs.get(key, (0, 0)))
+
+    if len(grid):
+        bounds = (int(grid['x'].min()), int(grid['y'].min()), int(grid['x'].max()), int(grid['y'].max()))
+    else:
+        bounds = (0, 0, 0, 0)
+
+    spawn = _first_spawn(grid_tiles, offgrid_tiles)
+    finish = _first_finish(grid_tiles)
+    flags = (FLAG_HAS_SPAWN if spawn else 0) | (FLAG_HAS_FINISH if finish else 0)
+    chunk_header = CHUNK_INDEX_HEADER.pack(chunk_size, len(chunks), *(spawn or (0, 0)), *(finish or (0, 0)))
+
+    header = BINARY_MAP_HEADER.pack(
+        BINARY_MAP_MAGIC, BINARY_MAP_VERSION, flags, *bounds, lowest_y,
+        len(type_names), len(grid), len(offgrid),
+        _content_hash(type_table, grid, offgrid, lowest_y)
+    )
+    return header + type_table + chunk_header + chunks.tobytes() + grid.tobytes() + offgrid.tobytes()
+
+
+def read_header(data):
+    if len(data) < BINARY_MAP_HEADER.size:
+        raise MapFormatError("truncated binary map")
+    (magic, version, flags, min_x, min_y, max_x, max_y, lowest_y,
+     type_count, grid_count, offgrid_count, content_hash) = BINARY_MAP_HEADER.unpack_from(data)
+    if magic != BINARY_MAP_MAGIC:
+        raise MapFormatError("not a binary map")
+    if version > BINARY_MAP_VERSION:
+        raise MapFormatError(f"binary map version {version} is newer than supported")
+    return {
+        'version': version, 'flags': flags,
+        'bounds': (min_x, min_y, max_x, max_y), LOWEST_Y: lowest_y,
+        'type_count': type_count, 'grid_count': grid_count, 'offgrid_count': offgrid_count,
+        'hash': content_hash.hex(),
+    }
+
+
+def read_layout(data):
+    # Header plus where each section of the file starts
+    header = read_header(data)
+    offset = BINARY_MAP_HEADER.size
+
+    type_names = []
+    for _ in range(header['type_count']):
+        length = data[offset]
+        type_names.append(bytes(data[offset + 1:offset + 1 + length]).decode())
+        offset += 1 + length
+    header['type_names'] = type_names
+
+    header['chunks'] = None
+    if header['version'] >= 2:
+        chunk_size, chunk_count, spawn_x, spawn_y, finish_x, finish_y = CHUNK_INDEX_HEADER.unpack_from(data, offset)
+        offset += CHUNK_INDEX_HEADER.size
+        header['chunk_size'] = chunk_size
+        header['spawn'] = (spawn_x, spawn_y) if header['flags'] & FLAG_HAS_SPAWN else None
+        header['finish'] = (finish_x, finish_y) if header['flags'] & FLAG_HAS_FINISH else None
+        header['chunks'] = np.frombuffer(data, dtype=CHUNK_DTYPE, count=chunk_count, offset=offset)
+        offset += header['chunks'].nbytes
+
+    header['grid'] = np.frombuffer(data, dtype=GRID_DTYPE, count=header['grid_count'], offset=offset)
+    offset += header['grid'].nbytes
+    offgrid_dtype = OFFGRID_DTYPE if header['version'] >= 3 else OFFGRID_DTYPE_V2
+    header['offgrid'] = np.frombuffer(data, dtype=offgrid_dtype, count=header['offgrid_count'], offset=offset)
+    return header
+
+
+def _grid_dict(grid, type_names):
+    grid_tiles = _tiles(grid, type_names, int)
+    keys = [f"{x};{y}" for x, y in zip(grid['x'].tolist(), grid['y'].tolist())]
+    return dict(zip(keys, grid_tiles))
+
+
+def decode_map(data):
+    layout = read_layout(data)
+    return records_to_map(layout['type_names'], layout['grid'], layout['offgrid'], layout[LOWEST_Y])
+
+
+class ChunkedMap:
+    # Read-only view of a chunked binary map. The file is memory mapped, so
+    # only the chunks that get decoded are ever paged in.
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        layout = read_layout(self.data)
+        if layout['chunks'] is None:
+            layout = None
+            self.close()
+            raise MapFormatError("binary map has no chunk index")
+        self.type_names = layout['type_names']
+        self.chunk_size = layout['chunk_size']
+        self.bounds = layout['bounds']
+        self.lowest_y = layout[LOWEST_Y]
+        self.spawn = layout['spawn']
+        self.finish = layout['finish']
+        self.grid_count = layout['grid_count']
+        self.grid = layout['grid']
+        self.offgrid = layout['offgrid']
+        # (cx, cy) -> (grid start, grid count, offgrid start, offgrid count)
+        self.chunks = {(cx, cy): runs for cx, cy, *runs in layout['chunks'].tolist()}
+
+    def chunk_at(self, pos):
+        # pos is in tiles
+        return int(pos[0] // self.chunk_size), int(pos[1] // self.chunk_size)
+
+    def load_chunk(self, key):
+        grid_start, grid_count, offgrid_start, offgrid_count = self.chunks[key]
+        grid = self.grid[grid_start:grid_start + grid_count]
+        offgrid = self.offgrid[offgrid_start:offgrid_start + offgrid_count]
+        return _grid_dict(grid, self.type_names), _tiles(offgrid, self.type_names, float)
+
+    def close(self):
+        # Arrays viewing the map must go before the mapping can close
+        self.grid = self.offgrid = None
+        self.data.close()
+        self.file.close()
+
+
+def open_chunked_map(path, min_tiles=0):
+    # A ChunkedMap when path is a chunked binary map of at least min_tiles
+    # grid tiles, otherwise None
+    if not is_binary_map(path):
+        return None
+    with open(path, 'rb') as f:
+        try:
+            header = read_header(f.read(BINARY_MAP_HEADER.size))
+        except MapFormatError:
+            return None
+    if header['version'] < 2 or header['grid_count'] < min_tiles:
+        return None
+    return ChunkedMap(path)
+
+
+def is_binary_map(path):
+    return Path(path).suffix.lower() == BINARY_MAP_EXTENSION
+
+
+def load_map_data(path):
+    if is_binary_map(path):
+        with open(path, 'rb') as f:
+            return decode_map(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_map_data(path, map_data):
+    # Written beside the target under a unique name and renamed over it, so
+    # a crash mid-write leaves the previous version of the map intact
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        if is_binary_map(path):
+            with os.fdopen(fd, 'wb') as f:
+                f.write(encode_map(map_data))
+        else:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(map_data, f, indent=4)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def convert_map(src, dst):
+    save_map_data(dst, load_map_data(src))
+
+
+def find_map_path(map_id, directory=MAPS_DIR):
+    # A map id may be stored in any supported format
+    for extension in MAP_EXTENSIONS:
+        path = os.path.join(directory, f"{map_id}{extension}")
+        if os.path.exists(path):
+            return path
+    return os.path.join(directory, f"{map_id}{MAP_EXTENSIONS[0]}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("usage: python -m scripts.mapformat <source map> <destination map>")
+        sys.exit(1)
+    convert_map(sys.argv[1], sys.argv[2])
+    print(f"{sys.argv[1]} ({os.path.getsize(sys.argv[1])} bytes) -> {sys.argv[2]} ({os.path.getsize(sys.argv[2])} bytes)")
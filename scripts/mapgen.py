@@ -0,0 +1,155 @@
+import argparse
+import os
+import numpy as np
+from scripts.constants import *
+from scripts.mapformat import save_map_data
+from scripts.tilemap import Tilemap
+
+# Seeded stress maps for benchmarks and profiling. A route of platforms
+# within jump reach runs from the spawner to the finish and is kept clear;
+# everything else (extra platforms, hazards, decor) is filler whose amount
+# scales with density, so tile counts can be swept independently of size.
+
+# One screen of the game in tiles (the tile size is a 24th of the width)
+SCREEN_TILES = (24, 18)
+
+# Route limits, well inside a single jump (about three tiles high)
+ROUTE_PLATFORM = (3, 8)
+ROUTE_GAP = (1, 3)
+ROUTE_RISE = 2
+# Rows above the route kept free so the jump arcs are never blocked
+ROUTE_HEADROOM = 4
+
+SOLID_TYPES = sorted(PHYSICS_TILES)
+
+
+def _route(rng, width, height):
+    # Platforms as (x0, x1, y) from left to right
+    platforms = []
+    x, y = 1, height // 2
+    low, high = ROUTE_HEADROOM + 2, height - 3
+    while True:
+        length = int(rng.integers(*ROUTE_PLATFORM, endpoint=True))
+        x1 = min(x + length, width - 2)
+        platforms.append((x, x1, y))
+        x = x1 + int(rng.integers(*ROUTE_GAP, endpoint=True))
+        if x >= width - ROUTE_PLATFORM[0] - 1:
+            return platforms
+        y = int(np.clip(y + rng.integers(-ROUTE_RISE, ROUTE_RISE, endpoint=True), low, high))
+
+
+def _filler(rng, solid, reserved, density):
+    # Random platforms 2-10 wide and 1-3 thick until roughly density of the
+    # free area is covered; painted as rects, then the reserved cells cleared
+    height, width = solid.shape
+    count = int(density * reserved.size / 12)
+    xs = rng.integers(0, width, count)
+    ys = rng.integers(ROUTE_HEADROOM, height - 1, count)
+    lengths = rng.integers(2, 11, count)
+    thicknesses = rng.integers(1, 4, count)
+    for x, y, length, thickness in zip(xs.tolist(), ys.tolist(), lengths.tolist(), thicknesses.tolist()):
+        solid[y:y + thickness, x:x + length] = True
+    solid &= ~reserved
+
+
+def _hazards(rng, solid, reserved, rate):
+    # Spikes on free cells touching filler: standing on floors (0), hanging
+    # from ceilings (180) and on walls (90 when the wall is to the right)
+    free = ~solid & ~reserved
+    padded = np.pad(solid, 1)
+    sides = {
+        0: padded[2:, 1:-1],
+        180: padded[:-2, 1:-1],
+        90: padded[1:-1, 2:],
+        270: padded[1:-1, :-2],
+    }
+    spikes = {}
+    for rotation, support in sides.items():
+        ys, xs = np.nonzero(free & support & (rng.random(solid.shape) < rate))
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            spikes.setdefault((x, y), rotation)
+    return spikes
+
+
+def generate_map(width, height, density=0.3, hazards=0.05, decor=0.02, seed=0):
+    # Map data in the format Tilemap.load reads, autotiled
+    width, height = max(width, 16), max(height, ROUTE_HEADROOM + 8)
+    rng = np.random.default_rng(seed)
+    solid = np.zeros((height, width), dtype=bool)
+    reserved = np.zeros((height, width), dtype=bool)
+    route = _route(rng, width, height)
+
+    # Each platform and the gap leading to it, from the higher of the two
+    # platforms' headroom down to the lower one
+    previous_end, previous_y = route[0][0], route[0][2]
+    for x0, x1, y in route:
+        reserved[min(y, previous_y) - ROUTE_HEADROOM:max(y, previous_y) + 1, previous_end:x0] = True
+        reserved[y - ROUTE_HEADROOM:y + 1, x0:x1 + 1] = True
+        previous_end, previous_y = x1 + 1, y
+    # Filler may sit below the route but never inside its headroom
+    _filler(rng, solid, reserved, density)
+    for x0, x1, y in route:
+        solid[y, x0:x1 + 1] = True
+    spikes = _hazards(rng, solid, reserved, hazards)
+    # A kill floor under everything catches falls
+    kill_row = height - 1
+    solid[kill_row] = False
+
+    # Terrain type changes in 8x8 blocks so autotiled platforms stay whole
+    blocks = rng.choice(SOLID_TYPES, size=(height // 8 + 1, width // 8 + 1))
+    types = np.repeat(np.repeat(blocks, 8, axis=0), 8, axis=1)[:height, :width]
+    tilemap = {}
+    ys, xs = np.nonzero(solid)
+    for x, y, tile_type in zip(xs.tolist(), ys.tolist(), types[ys, xs].tolist()):
+        tilemap[f"{x};{y}"] = {TYPE: tile_type, VARIANT: 0, POS: [x, y]}
+    for (x, y), rotation in spikes.items():
+        if y != kill_row:
+            tilemap[f"{x};{y}"] = {TYPE: 'spikes', VARIANT: 0, POS: [x, y], ROTATION: rotation}
+    for x in range(width):
+        tilemap[f"{x};{kill_row}"] = {TYPE: 'kill', VARIANT: 0, POS: [x, kill_row]}
+
+    start, end = route[0], route[-1]
+    spawn = (start[0] + 1, start[2] - 1)
+    tilemap[f"{spawn[0]};{spawn[1]}"] = {TYPE: SPAWNER, VARIANT: 0, POS: list(spawn)}
+    finish_x = end[1] - 1
+    tilemap[f"{finish_x};{end[2] - 2}"] = {TYPE: 'finish up', VARIANT: 0, POS: [finish_x, end[2] - 2]}
+    tilemap[f"{finish_x};{end[2] - 1}"] = {TYPE: 'finish down', VARIANT: 0, POS: [finish_x, end[2] - 1]}
+
+    # Decor rests on top of filler, at fractional offgrid positions
+    tops = solid & ~np.pad(solid, ((1, 0), (0, 0)))[:-1] & ~reserved
+    tops[kill_row] = False
+    ys, xs = np.nonzero(tops & (rng.random(solid.shape) < decor))
+    offsets = rng.random(len(xs))
+    offgrid = [
+        {TYPE: 'decor', VARIANT: 0, POS: [round(x + offset, 3), y - 1]}
+        for x, y, offset in zip(xs.tolist(), ys.tolist(), offsets.tolist())
+        if f"{x};{y - 1}" not in tilemap
+    ]
+
+    tiles = Tilemap(None, TILE_SIZE, env=False)
+    tiles.tilemap = tilemap
+    tiles.autotile()
+    return {TILEMAP: tilemap, OFFGRID: offgrid, LOWEST_Y: kill_row}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a seeded stress-test map.")
+    parser.add_argument('output', help="map path; the extension picks JSON or the binary format")
+    parser.add_argument('--screens', type=int, help="width in screens; overrides --width and --height")
+    parser.add_argument('--width', type=int, default=SCREEN_TILES[0] * 4, help="width in tiles")
+    parser.add_argument('--height', type=int, default=SCREEN_TILES[1] * 2, help="height in tiles")
+    parser.add_argument('--density', type=float, default=0.3, help="filler platforms, 0 for the route only")
+    parser.add_argument('--hazards', type=float, default=0.05, help="chance of a spike on each filler face")
+    parser.add_argument('--decor', type=float, default=0.02, help="chance of decor on each filler top")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    width, height = args.width, args.height
+    if args.screens:
+        width, height = SCREEN_TILES[0] * args.screens, SCREEN_TILES[1] * 2
+    map_data = generate_map(width, height, args.density, args.hazards, args.decor, args.seed)
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    save_map_data(args.output, map_data)
+    print(f"{args.output}: {width}x{height} tiles, {len(map_data[TILEMAP])} grid, "
+          f"{len(map_data[OFFGRID])} offgrid, {os.path.getsize(args.output)} bytes")
@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from scripts.tilemap import write_map
+from scripts.validator import validate_map
+
+
+def _lower_priority():
+    # Checks yield the CPU to the editor on machines with few cores
+    if hasattr(os, 'nice'):
+        os.nice(10)
+
+
+class MapSaver:
+    def __init__(self):
+        # One worker, so saves of the same file land in the order requested
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.pending = []
+        # Written maps are checked for completability in a process of their
+        # own: a check is seconds of pure-Python physics, which on a thread
+        # would hold the GIL against the editor's frames. Started on first use.
+        self.checker = None
+        # Checks started by the save worker, handed over to the main thread
+        self.submitted = queue.Queue()
+        self.checks = []
+
+    def save(self, path, map_data, compile=True, validate=False):
+        # map_data must be a snapshot nobody edits any more (Tilemap.snapshot)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        future = self.pool.submit(write_map, path, map_data, compile)
+        self.pending.append((path, future))
+        if validate:
+            future.add_done_callback(lambda done: self._check(path, done))
+        return future
+
+    def _check(self, path, done):
+        # Runs on the save worker. The file is read back, so the check sees
+        # exactly what was written.
+        if done.exception() is None:
+            if self.checker is None:
+                # Daemonic workers, so quitting never waits for a check
+                self.checker = multiprocessing.get_context('spawn').Pool(processes=1, initializer=_lower_priority)
+            self.submitted.put((path, self.checker.apply_async(validate_map, (path,))))
+
+    def busy(self):
+        return any(not future.done() for _, future in self.pending)
+
+    def completed(self):
+        # (path, error, warning) for every save that finished since the last
+        # call; error is None when the map was written, warning is what went
+        # wrong baking its sidecar, if anything
+        done, pending = [], []
+        for item in self.pending:
+            (done if item[1].done() else pending).append(item)
+        self.pending = pending
+        return [
+            (path, future.exception(), None if future.exception() else future.result())
+            for path, future in done
+        ]
+
+    def reports(self):
+        # (path, ValidationReport or None, error) for every finished check
+        while True:
+            try:
+                self.checks.append(self.submitted.get_nowait())
+            except queue.Empty:
+                break
+        done, pending = [], []
+        for item in self.checks:
+            (done if item[1].ready() else pending).append(item)
+        self.checks = pending
+        results = []
+        for path, result in done:
+            try:
+                results.append((path, result.get(), None))
+            except Exception as error:
+                results.append((path, None, error))
+        return results
+
+
+map_saver = MapSaver()
@@ -1,9 +1,12 @@
 import pygame
 import os
-from scripts.constants import DISPLAY_SIZE, FONT, MENUBG    
+from scripts.constants import DISPLAY_SIZE, FONT, MENUBG
 from scripts.utils import MenuScreen, render_text_with_shadow
 from scripts.GameManager import game_state_manager
 from scripts.utils import calculate_ui_constants
+from scripts.assets import AssetManager
+from scripts.mapcatalog import map_catalog
+from scripts.thumbnails import attach_thumbnails
 
 class Menu:
     def __init__(self, screen, clock):
@@ -87,6 +90,7 @@ class Menu:
     def _select_map(self, map_file):
         self.selected_map = os.path.join('data', 'maps', map_file)
         game_state_manager.selected_map = self.selected_map
+        AssetManager().prefetch_map(self.selected_map)
         self.play_game()
 
     def play_game(self):
@@ -384,6 +388,8 @@ class MapSelectionScreen(MenuScreen):
         self.total_pages = 0
         self.map_files = []
         self.map_numbers = []
+        self.map_buttons = []
+        self.map_entries = []
 
     def initialize(self):
         self.title = "Select a Map"
@@ -391,15 +397,8 @@ class MapSelectionScreen(MenuScreen):
         self.recreate_buttons()
 
     def load_maps(self):
-        maps_dir = 'data/maps'
-        self.map_files = [f for f in os.listdir(maps_dir) if f.endswith('.json')]
-        
-        # Sort map files numerically
-        def get_map_number(filename):
-            return int(filename.split('.')[0])
-
-                
-        self.map_files.sort(key=get_map_number)
+        # Already sorted numerically by the catalog
+        self.map_files = map_catalog.filenames()
         
         self.total_pages = (len(self.map_files) + self.UI_CONSTANTS['MAPS_PER_PAGE'] - 1) // self.UI_CONSTANTS['MAPS_PER_PAGE']
         
@@ -432,6 +431,8 @@ class MapSelectionScreen(MenuScreen):
         # Create map selection buttons
         actions = [lambda i=i: self.menu._select_map(current_page_files[i]) for i in range(len(current_page_files))]
         self.create_grid_buttons(current_page_numbers, actions, start_x, int(DISPLAY_SIZE[1] * 0.25), button_width)
+        self.map_buttons = self.buttons[:len(current_page_files)]
+        self.map_entries = [map_catalog.get(map_file) for map_file in current_page_files]
         
         # Relative positions for navigation buttons
         middle_y = DISPLAY_SIZE[1] * 0.37  # 40% down the screen
@@ -474,6 +475,10 @@ class MapSelectionScreen(MenuScreen):
             self.current_page -= 1
             self.recreate_buttons()
 
+    def draw(self, surface):
+        attach_thumbnails(self.map_buttons, self.map_entries)
+        super().draw(surface)
+
 class EditorMapSelectionScreen(MenuScreen):
     def __init__(self, menu, title="Edit a Map"):
         super().__init__(menu, title)
@@ -481,6 +486,8 @@ class EditorMapSelectionScreen(MenuScreen):
         self.total_pages = 0
         self.map_files = []
         self.map_numbers = []
+        self.map_buttons = []
+        self.map_entries = []
 
     def initialize(self):
         self.title = "Edit a Map"
@@ -488,20 +495,8 @@ class EditorMapSelectionScreen(MenuScreen):
         self.create_map_buttons()
         
     def load_maps(self):
-        maps_dir = 'data/maps'
-        if not os.path.exists(maps_dir):
-            os.makedirs(maps_dir)
-            
-        self.map_files = [f for f in os.listdir(maps_dir) if f.endswith('.json')]
-        
-        # Sort map files numerically
-        def get_map_number(filename):
-            try:
-                return int(filename.split('.')[0])
-            except ValueError:
-                return float('inf')
-                
-        self.map_files.sort(key=get_map_number)
+        # Already sorted numerically by the catalog
+        self.map_files = map_catalog.filenames()
         
         # Fixed at 20 maps per page
         maps_per_page = 20
@@ -548,6 +543,8 @@ class EditorMapSelectionScreen(MenuScreen):
             int(DISPLAY_SIZE[1] * 0.25),  # 25% from top
             button_width
         )
+        self.map_buttons = self.buttons[:len(current_page_files)]
+        self.map_entries = [map_catalog.get(map_file) for map_file in current_page_files]
         
         # Calculate the position for navigation buttons - use relative positioning
         middle_y = DISPLAY_SIZE[1] * 0.37  # 37% down the screen
@@ -593,4 +590,8 @@ class EditorMapSelectionScreen(MenuScreen):
     def previous_page(self):
         if self.current_page > 0:
             self.current_page -= 1
-            self.create_map_buttons()
\ No newline at end of file
+            self.create_map_buttons()
+
+    def draw(self, surface):
+        attach_thumbnails(self.map_buttons, self.map_entries)
+        super().draw(surface)
@@ -0,0 +1,109 @@
+import numpy as np
+from scripts.constants import *
+
+# Palette indices written into observation buffers
+OBS_EMPTY = 0
+OBS_SOLID = 1
+OBS_HAZARD = 2
+OBS_FINISH = 3
+OBS_PLAYER = 4
+
+GRAYSCALE_PALETTE = np.array([0, 85, 170, 255, 210], dtype=np.uint8)
+
+
+def tile_class(tile_type):
+    base_type = tile_type.split()[0]
+    if base_type in PHYSICS_TILES:
+        return OBS_SOLID
+    if base_type in ('spikes', 'kill'):
+        return OBS_HAZARD
+    if base_type == 'finish':
+        return OBS_FINISH
+    return OBS_EMPTY
+
+
+def map_bounds(tilemap, offgrid_tiles):
+    xs = [tile[POS][0] for tile in tilemap.values()] + [int(tile[POS][0]) for tile in offgrid_tiles]
+    ys = [tile[POS][1] for tile in tilemap.values()] + [int(tile[POS][1]) for tile in offgrid_tiles]
+    if not xs:
+        return 0, 0, 0, 0
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def build_class_grid(tilemap, offgrid_tiles, pixels_per_tile=1):
+    # Dense palette-indexed raster of the map; returns the grid and the tile
+    # coordinate of its top-left corner
+    min_x, min_y, max_x, max_y = map_bounds(tilemap, offgrid_tiles)
+    ppt = pixels_per_tile
+    grid = np.zeros(((max_y - min_y + 1) * ppt, (max_x - min_x + 1) * ppt), dtype=np.uint8)
+
+    def stamp(tile, tile_x, tile_y):
+        cls = tile_class(tile[TYPE])
+        if cls == OBS_EMPTY:
+            return
+        px, py = int((tile_x - min_x) * ppt), int((tile_y - min_y) * ppt)
+        if tile[TYPE] == 'spikes' and ppt > 1:
+            spike_w, spike_h = max(1, int(ppt * SPIKE_SIZE[0])), max(1, int(ppt * SPIKE_SIZE[1]))
+            offset_fn = SPIKE_POSITION_OFFSETS.get(tile.get(ROTATION, 0), SPIKE_POSITION_OFFSETS[0])
+            x, y, w, h = offset_fn(px, py, spike_w, spike_h, ppt)
+        else:
+            x, y, w, h = px, py, ppt, ppt
+        grid[max(0, y):y + h, max(0, x):x + w] = cls
+
+    for tile in tilemap.values():
+        stamp(tile, tile[POS][0], tile[POS][1])
+    for tile in offgrid_tiles:
+        stamp(tile, tile[POS][0], tile[POS][1])
+
+    return grid, (min_x, min_y)
+
+
+class ObservationRenderer:
+    def __init__(self, tilemap, size=OBS_SIZE, view_tiles=OBS_VIEW_TILES, grayscale=False):
+        self.tilemap = tilemap
+        self.size = size
+        self.ppt = max(1, min(size) // view_tiles)
+        self.grayscale = grayscale
+        self.rebuild()
+
+    def rebuild(self):
+        grid, origin = build_class_grid(self.tilemap.tilemap, self.tilemap.offgrid_tiles, self.ppt)
+        # Pad by a full view so every crop stays inside the array
+        self.pad = max(self.size)
+        self.pixels = np.pad(grid, self.pad)
+        self.origin = origin
+        self.revision = getattr(self.tilemap, 'revision', 0)
+
+    def _crop_starts(self, centers):
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        scale = self.ppt / self.tilemap.tile_size
+        px = (centers[:, 0] * scale).astype(np.int64) - self.origin[0] * self.ppt + self.pad
+        py = (centers[:, 1] * scale).astype(np.int64) - self.origin[1] * self.ppt + self.pad
+        x0 = np.clip(px - self.size[0] // 2, 0, self.pixels.shape[1] - self.size[0])
+        y0 = np.clip(py - self.size[1] // 2, 0, self.pixels.shape[0] - self.size[1])
+        return x0, y0
+
+    def render_batch(self, centers, player_size=PLAYERS_SIZE, out=None):
+        # centers are player rect centres in world pixels, one row per agent
+        if getattr(self.tilemap, 'revision', 0) != self.revision:
+            self.rebuild()
+        x0, y0 = self._crop_starts(centers)
+        rows = y0[:, None] + np.arange(self.size[1])
+        cols = x0[:, None] + np.arange(self.size[0])
+        if out is None:
+            out = np.empty((len(x0), self.size[1], self.size[0]), dtype=np.uint8)
+        out[...] = self.pixels[rows[:, :, None], cols[:, None, :]]
+
+        # Each agent sits at the centre of its own view
+        pw = max(1, player_size[0] * self.ppt // self.tilemap.tile_size)
+        ph = max(1, player_size[1] * self.ppt // self.tilemap.tile_size)
+        cx, cy = self.size[0] // 2, self.size[1] // 2
+        out[:, cy - ph // 2:cy - ph // 2 + ph, cx - pw // 2:cx - pw // 2 + pw] = OBS_PLAYER
+
+        if self.grayscale:
+            np.take(GRAYSCALE_PALETTE, out, out=out)
+        return out
+
+    def render(self, center, player_size=PLAYERS_SIZE, out=None):
+        batch_out = None if out is None else out[None]
+        return self.render_batch([center], player_size, batch_out)[0]
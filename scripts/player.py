@@ -329,7 +329,7 @@ class Player:
         image_rect = image.get_rect(center=(self.pos[0] + self.size[0] // 2 - offset[0],
                                                 self.pos[1] + self.size[1] // 2 - offset[1]))
         # Draw the rotated image
-        surf.blit(image, image_rect)
+        return surf.blit(image, image_rect)
 
     def render_ai(self, surf, offset=(0, 0)):
         # Draw a simple rectangle for AI mode
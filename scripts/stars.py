@@ -31,7 +31,7 @@ class Star:
         img = self._cached_img
         offset = np.array(offset, dtype=float)  # Ensure offset is numpy array
         render_pos = self.pos - offset * self.depth
-        surf.blit(
+        return surf.blit(
             img,
             (
                 render_pos[0] % (surf.get_width() + img.get_width()) - img.get_width(),
@@ -60,5 +60,4 @@ class Stars:
             star.update(dt)
 
     def render(self, surf, offset=(0, 0)):
-        for star in self.stars:
-            star.render(surf, offset)
\ No newline at end of file
+        return [star.render(surf, offset) for star in self.stars]
\ No newline at end of file
@@ -0,0 +1,115 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import pygame
+from scripts.constants import *
+from scripts.mapformat import load_map_data
+from scripts.mapcompile import source_hash
+from scripts.observation import build_class_grid, OBS_EMPTY, OBS_SOLID, OBS_HAZARD, OBS_FINISH
+
+THUMBNAIL_VERSION = 1
+
+# RGBA per observation class; the area around the map stays transparent
+THUMBNAIL_PALETTE = np.zeros((5, 4), dtype=np.uint8)
+THUMBNAIL_PALETTE[OBS_EMPTY] = (8, 10, 38, 255)
+THUMBNAIL_PALETTE[OBS_SOLID] = (150, 160, 200, 255)
+THUMBNAIL_PALETTE[OBS_HAZARD] = (220, 60, 60, 255)
+THUMBNAIL_PALETTE[OBS_FINISH] = (255, 255, 255, 255)
+
+
+def _resample_axis(grid, size, axis):
+    # Shrinking keeps the highest class of each block, so thin platforms and
+    # single hazards survive; growing repeats cells
+    length = grid.shape[axis]
+    if size >= length:
+        index = np.arange(size) * length // size
+        return np.take(grid, index, axis=axis)
+    starts = np.arange(size) * length // size
+    return np.maximum.reduceat(grid, starts, axis=axis)
+
+
+def rasterize_thumbnail(map_data, size=THUMBNAIL_SIZE):
+    # RGBA array of the map fitted inside size, centred, aspect preserved
+    classes, _ = build_class_grid(map_data[TILEMAP], map_data[OFFGRID])
+    height, width = classes.shape
+    scale = min(size[0] / width, size[1] / height)
+    out_w, out_h = max(1, min(size[0], round(width * scale))), max(1, min(size[1], round(height * scale)))
+    fitted = _resample_axis(_resample_axis(classes, out_h, 0), out_w, 1)
+
+    rgba = np.zeros((size[1], size[0], 4), dtype=np.uint8)
+    x, y = (size[0] - out_w) // 2, (size[1] - out_h) // 2
+    rgba[y:y + out_h, x:x + out_w] = THUMBNAIL_PALETTE[fitted]
+    return rgba
+
+
+def thumbnail_cache_path(content_hash, size=THUMBNAIL_SIZE):
+    return Path(THUMBNAIL_CACHE_DIR) / f"{content_hash}_{size[0]}x{size[1]}_v{THUMBNAIL_VERSION}.png"
+
+
+def build_thumbnail(map_path, size=THUMBNAIL_SIZE):
+    # Worker-side: returns an unconverted Surface and its cache file. Keyed by
+    # the map's content, so renaming or touching a map reuses its thumbnail.
+    cache_path = thumbnail_cache_path(source_hash(map_path), size)
+    if cache_path.exists():
+        return pygame.image.load(str(cache_path)), cache_path
+
+    rgba = rasterize_thumbnail(load_map_data(map_path), size)
+    surface = pygame.image.frombuffer(rgba.tobytes(), size, 'RGBA').copy()
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique temp name, so builds of the same thumbnail cannot collide
+    fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix='.tmp.png')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pygame.image.save(surface, f, 'png')
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return surface, cache_path
+
+
+class ThumbnailService:
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        # (path, mtime) -> converted Surface, or None if it could not be built
+        self.surfaces = {}
+        self.pending = {}
+
+    def get(self, entry):
+        # Non-blocking: the thumbnail of a catalog entry once it is ready,
+        # otherwise None and the build is queued
+        key = (entry.path, entry.mtime)
+        if key in self.surfaces:
+            return self.surfaces[key]
+        future = self.pending.get(key)
+        if future is None:
+            self.pending[key] = self.pool.submit(build_thumbnail, entry.path)
+            return None
+        if not future.done():
+            return None
+        del self.pending[key]
+        try:
+            surface, cache_path = future.result()
+        except Exception:
+            # Any broken map just goes without a thumbnail; the menu drawing
+            # it must never fail because of one
+            self.surfaces[key] = None
+            return None
+        # Conversion needs the display, so it happens here on the main thread
+        self.surfaces[key] = surface.convert_alpha()
+        entry.thumbnail = str(cache_path)
+        return self.surfaces[key]
+
+
+def attach_thumbnails(buttons, entries):
+    # Give map buttons their thumbnails as the worker finishes them
+    for button, entry in zip(buttons, entries):
+        if button.image is None:
+            surface = thumbnail_service.get(entry)
+            if surface is not None:
+                button.set_image(surface)
+
+
+thumbnail_service = ThumbnailService()
@@ -1,9 +1,34 @@
 # tilemap.py
-import json
+import numpy as np
 import pygame
 from scripts.constants import *
+from scripts.mapformat import load_map_data, save_map_data, open_chunked_map
+from scripts.mapcompile import (
+    SPAWNER_IDS, compile_tilemap, save_compiled_map, load_compiled_map, source_hash
+)
 from pathlib import Path
 
+# Autotile mask (see AUTOTILE_SHIFTS) -> variant, -1 where the variant is left alone
+AUTOTILE_TABLE = np.array([
+    AUTOTILE_MAP.get(tuple(sorted(shift for shift, bit in AUTOTILE_SHIFTS.items() if mask & bit)), -1)
+    for mask in range(16)
+], dtype=np.int16)
+# An edited cell and the neighbours whose variant it can change, then
+# everything within two steps, which also holds their neighbours
+AUTOTILE_STEP = np.array([(0, 0), *AUTOTILE_SHIFTS], dtype=np.int64)
+AUTOTILE_REACH = np.array(
+    [(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3) if abs(dx) + abs(dy) <= 2], dtype=np.int64
+)
+
+
+def pack_cells(xy):
+    # (n, 2) int64 cell coordinates -> one sortable int64 key per cell
+    return (xy[:, 0] << 32) | (xy[:, 1] + 2**31)
+
+
+def unpack_cells(keys):
+    return keys >> 32, (keys & 0xFFFFFFFF) - 2**31
+
 class Tilemap:
     def __init__(self, game, tile_size=16, env=True):
         self.game = game
@@ -12,6 +37,19 @@ class Tilemap:
         self.tilemap = {}
         self.offgrid_tiles = []
         self.lowest_y = 0
+        # Bumped whenever the tile data is replaced, so derived rasters can rebuild
+        self.revision = 0
+        # Set while a large binary map is streamed in chunk by chunk
+        self.stream = None
+        self.resident_chunks = {}
+        self.focus_chunks = None
+        # Tiles taken out by extract must stay out when their chunk reloads
+        self.extracted_locs = set()
+        self.extracted_offgrid = set()
+        # The game takes spawners out of the map on load; the editor keeps them
+        self.spawners = []
+        # Baked collision and hazard data of the loaded map, when available
+        self.compiled = None
     
     def tiles_around(self, pos):
         tiles = []
@@ -31,6 +69,7 @@ class Tilemap:
                 matches.append(tile.copy())
                 if not keep:
                     self.offgrid_tiles.remove(tile)
+                    self.extracted_offgrid.add(self._offgrid_key(tile))
         
         # Handle grid tiles
         processed = set()
@@ -55,14 +94,17 @@ class Tilemap:
                 processed.update([loc, down_loc])
                 if not keep:
                     del self.tilemap[loc]
+                    self.extracted_locs.add(loc)
                     if down_loc in self.tilemap:
                         del self.tilemap[down_loc]
+                        self.extracted_locs.add(down_loc)
             elif not tile[TYPE].endswith(' down'):  # Regular tiles
                 match = self._create_match(tile, base_type)
                 matches.append(match)
                 processed.add(loc)
                 if not keep:
                     del self.tilemap[loc]
+                    self.extracted_locs.add(loc)
         
         return matches
     
@@ -72,20 +114,77 @@ class Tilemap:
         match[POS] = [tile[POS][0] * self.tile_size, tile[POS][1] * self.tile_size]
         return match
 
+    def _autotile_tile(self, tile):
+        neighbors = set()
+        for shift in AUTOTILE_SHIFTS:
+            check_loc = f"{tile[POS][0] + shift[0]};{tile[POS][1] + shift[1]}"
+            if check_loc in self.tilemap and self.tilemap[check_loc][TYPE] == tile[TYPE]:
+                neighbors.add(shift)
+        
+        neighbors = tuple(sorted(neighbors))
+        if neighbors in AUTOTILE_MAP:
+            tile[VARIANT] = AUTOTILE_MAP[neighbors]
+
     def autotile(self):
-        for tile in self.tilemap.values():
-            if tile[TYPE] not in AUTOTILE_TYPES:
-                continue
-                
-            neighbors = set()
-            for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
-                check_loc = f"{tile[POS][0] + shift[0]};{tile[POS][1] + shift[1]}"
-                if check_loc in self.tilemap and self.tilemap[check_loc][TYPE] == tile[TYPE]:
-                    neighbors.add(shift)
-            
-            neighbors = tuple(sorted(neighbors))
-            if neighbors in AUTOTILE_MAP:
-                tile[VARIANT] = AUTOTILE_MAP[neighbors]
+        # Whole map at once
+        tiles = [tile for tile in self.tilemap.values() if tile[TYPE] in AUTOTILE_TYPES]
+        self._autotile_dense(tiles, tiles)
+
+    def _autotile_dense(self, tiles, context):
+        # Rasterize the autotile tiles of context into a dense grid and build
+        # the neighbour mask of every tile in tiles with array shifts; context
+        # must hold the neighbours of tiles
+        if not tiles:
+            return
+        cxs = np.array([tile[POS][0] for tile in context], dtype=np.int64)
+        cys = np.array([tile[POS][1] for tile in context], dtype=np.int64)
+        min_x, min_y = cxs.min(), cys.min()
+        width, height = int(cxs.max() - min_x) + 3, int(cys.max() - min_y) + 3
+        if width * height > AUTOTILE_DENSE_LIMIT:
+            for tile in tiles:
+                self._autotile_tile(tile)
+            return
+
+        type_ids = {tile_type: i for i, tile_type in enumerate(sorted(AUTOTILE_TYPES))}
+        # One cell of padding so every shift stays inside the grid
+        grid = np.full((height, width), -1, dtype=np.int16)
+        grid[cys - min_y + 1, cxs - min_x + 1] = [type_ids[tile[TYPE]] for tile in context]
+
+        ids = np.array([type_ids[tile[TYPE]] for tile in tiles], dtype=np.int16)
+        gx = np.array([tile[POS][0] for tile in tiles], dtype=np.int64) - min_x + 1
+        gy = np.array([tile[POS][1] for tile in tiles], dtype=np.int64) - min_y + 1
+        mask = np.zeros(len(tiles), dtype=np.int64)
+        for (dx, dy), bit in AUTOTILE_SHIFTS.items():
+            mask |= (grid[gy + dy, gx + dx] == ids) * bit
+        for tile, variant in zip(tiles, AUTOTILE_TABLE[mask].tolist()):
+            if variant >= 0:
+                tile[VARIANT] = variant
+
+    def autotile_at(self, positions):
+        # Incremental pass after an edit: only the edited cells and their
+        # 4-neighbourhood can change
+        if len(positions) < AUTOTILE_BATCH_MIN:
+            cells = {(x + dx, y + dy) for x, y in positions for dx, dy in [(0, 0), *AUTOTILE_SHIFTS]}
+            for x, y in cells:
+                tile = self.tilemap.get(f"{x};{y}")
+                if tile is not None and tile[TYPE] in AUTOTILE_TYPES:
+                    self._autotile_tile(tile)
+            return
+
+        # Bulk edits: each cell in reach is looked up once, and the tiles one
+        # step away are the ones re-autotiled
+        points = np.asarray(positions, dtype=np.int64).reshape(-1, 1, 2)
+        near = np.unique(pack_cells((points + AUTOTILE_REACH).reshape(-1, 2)))
+        inner = np.isin(near, pack_cells((points + AUTOTILE_STEP).reshape(-1, 2)))
+        xs, ys = unpack_cells(near)
+        tiles, context = [], []
+        for x, y, changes in zip(xs.tolist(), ys.tolist(), inner.tolist()):
+            tile = self.tilemap.get(f"{x};{y}")
+            if tile is not None and tile[TYPE] in AUTOTILE_TYPES:
+                context.append(tile)
+                if changes:
+                    tiles.append(tile)
+        self._autotile_dense(tiles, context)
 
     def _handle_spawners(self, path_for_save=False):
         spawner_tiles = self.extract([(SPAWNER, 0), (SPAWNER, 1)], keep=True)
@@ -106,24 +205,186 @@ class Tilemap:
             }
 
     def save(self, path):
-        self.lowest_y = max((tile[POS][1] for tile in self.tilemap.values()), default=0)
+        write_map(path, self.prepare_save())
+
+    def prepare_save(self):
+        # Main-thread half of saving: merges spawners and returns a snapshot
+        # that write_map can serialize on any thread
         self._handle_spawners()
-        
-        with open(path, 'w') as f:
-            json.dump({
-                TILEMAP: self.tilemap, 
-                OFFGRID: self.offgrid_tiles,
-                LOWEST_Y: self.lowest_y,
-            }, f, indent=4)
+        snapshot = self.snapshot()
+        self.lowest_y = snapshot[LOWEST_Y]
+        return snapshot
+
+    def snapshot(self):
+        # Streamed maps only hold the chunks near the player and are read-only
+        if self.stream is not None:
+            raise RuntimeError("cannot save a streamed map")
+        # Tiles are edited in place, so each one is copied; positions are
+        # only ever replaced and can be shared
+        return {
+            TILEMAP: {loc: dict(tile) for loc, tile in self.tilemap.items()},
+            OFFGRID: [dict(tile) for tile in self.offgrid_tiles],
+            LOWEST_Y: max((tile[POS][1] for tile in self.tilemap.values()), default=0),
+        }
+
+    def compile(self, path):
+        # Bake the sidecar from the map as saved, processed the way the game
+        # loads it, without touching this tilemap's own tiles
+        scratch = Tilemap(self.game, TILE_SIZE, env=False)
+        scratch.load(path)
+        if COMPILE_AUTOTILE:
+            scratch.autotile()
+        spawners = scratch.extract(SPAWNER_IDS)
+        save_compiled_map(path, compile_tilemap(scratch, spawners, source_hash(path)))
         
     def load(self, path):
-        with open(path, 'r') as f:
-            map_data = json.load(f)
+        self.close_stream()
+        self.extracted_locs = set()
+        self.extracted_offgrid = set()
+        # Only the game streams; the editor needs every tile to save
+        stream = open_chunked_map(path, MAP_STREAM_MIN_TILES) if self.env else None
+        if stream is not None:
+            self.stream = stream
+            self.tilemap = {}
+            self.offgrid_tiles = []
+            self.lowest_y = stream.lowest_y
+            # Spawners were already merged when the map was saved
+            spawn = stream.spawn or (0, 0)
+            self.stream_around((spawn[0] * self.tile_size, spawn[1] * self.tile_size))
+            self.spawners = self.extract(SPAWNER_IDS)
+            self.compiled = None
+        else:
+            self.compiled = load_compiled_map(path, self.tile_size) if self.env else None
+            if self.compiled is not None:
+                # Fresh sidecar: tiles come out already processed
+                map_data = self.compiled.map_data()
+                self.spawners = self.compiled.spawners()
+            else:
+                map_data = load_map_data(path)
+            self.tilemap = map_data[TILEMAP]
+            self.offgrid_tiles = map_data[OFFGRID]
+            self.lowest_y = map_data.get(LOWEST_Y, 0)
+            if self.compiled is None:
+                self._handle_spawners()
+                if self.env:
+                    self._process_for_game()
+        self.revision += 1
+
+    def load_data(self, map_data):
+        # Play a map handed over in memory, e.g. the editor's playtest
+        # snapshot; nothing is read from or written to disk
+        self.close_stream()
+        self.extracted_locs = set()
+        self.extracted_offgrid = set()
         self.tilemap = map_data[TILEMAP]
         self.offgrid_tiles = map_data[OFFGRID]
         self.lowest_y = map_data.get(LOWEST_Y, 0)
         self._handle_spawners()
-    
+        if COMPILE_AUTOTILE:
+            self.autotile()
+        self.spawners = self.extract(SPAWNER_IDS)
+        self.compiled = None
+        self.revision += 1
+
+    def _process_for_game(self):
+        # Full processing for a map without a fresh sidecar. Sidecars are
+        # only baked when a map is saved or by the mapcompile CLI, never by
+        # the game, so parallel game processes never write into data/maps.
+        if COMPILE_AUTOTILE:
+            self.autotile()
+        self.spawners = self.extract(SPAWNER_IDS)
+
+    def take_over(self, other):
+        # Adopt a map loaded by another Tilemap (e.g. prefetched on a worker)
+        # in place, so everything holding on to this one sees the new level
+        self.close_stream()
+        for name in ('tilemap', 'offgrid_tiles', 'lowest_y', 'stream', 'resident_chunks', 'focus_chunks',
+                     'extracted_locs', 'extracted_offgrid', 'spawners', 'compiled'):
+            setattr(self, name, getattr(other, name))
+        other.stream = None
+        self.revision += 1
+
+    def close_stream(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        self.resident_chunks = {}
+        self.focus_chunks = None
+
+    @staticmethod
+    def _offgrid_key(tile):
+        return tile[TYPE], tile[VARIANT], tuple(tile[POS])
+
+    def stream_around(self, *points):
+        # Keep the chunks around each point (world pixels) decoded. Chunks are
+        # dropped one ring further out than they are loaded so walking along
+        # a chunk border does not thrash.
+        if self.stream is None:
+            return
+        chunk_px = self.stream.chunk_size * self.tile_size
+        focus = tuple(sorted({(int(x // chunk_px), int(y // chunk_px)) for x, y in points}))
+        if focus == self.focus_chunks:
+            return
+        self.focus_chunks = focus
+
+        def ring(radius):
+            return {
+                (cx + dx, cy + dy)
+                for cx, cy in focus
+                for dx in range(-radius, radius + 1)
+                for dy in range(-radius, radius + 1)
+            }
+
+        wanted = {key for key in ring(MAP_STREAM_RADIUS) if key in self.stream.chunks}
+        keep = ring(MAP_STREAM_RADIUS + 1)
+        changed = False
+        loaded = []
+
+        for key in [key for key in self.resident_chunks if key not in keep]:
+            locs, offgrid = self.resident_chunks.pop(key)
+            for loc in locs:
+                self.tilemap.pop(loc, None)
+            if offgrid:
+                dropped = {id(tile) for tile in offgrid}
+                self.offgrid_tiles = [tile for tile in self.offgrid_tiles if id(tile) not in dropped]
+            changed = True
+
+        for key in wanted - self.resident_chunks.keys():
+            grid, offgrid = self.stream.load_chunk(key)
+            for loc in self.extracted_locs & grid.keys():
+                del grid[loc]
+            if self.extracted_offgrid:
+                offgrid = [tile for tile in offgrid if self._offgrid_key(tile) not in self.extracted_offgrid]
+            self.tilemap.update(grid)
+            self.offgrid_tiles.extend(offgrid)
+            self.resident_chunks[key] = (list(grid), offgrid)
+            loaded.extend(tile[POS] for tile in grid.values())
+            changed = True
+
+        # Streamed tiles are autotiled like a fully loaded map: the new
+        # chunks plus the one-tile border of the chunks already resident
+        if loaded and COMPILE_AUTOTILE:
+            self.autotile_at(loaded)
+
+        if changed:
+            self.revision += 1
+
+    def finish_location(self):
+        # Tile position of the finish, without needing its chunk decoded
+        if self.stream is not None:
+            return self.stream.finish
+        for tile in self.tilemap.values():
+            if tile[TYPE].startswith('finish'):
+                return tile[POS][0], tile[POS][1]
+        return None
+
+    def used_types(self):
+        if self.stream is not None:
+            return {tile_type.split()[0] for tile_type in self.stream.type_names}
+        types = {tile[TYPE].split()[0] for tile in self.tilemap.values()}
+        types.update(tile[TYPE].split()[0] for tile in self.offgrid_tiles)
+        return types
+
     def physics_rects_around(self, pos):
         rects = []
         for tile in self.tiles_around(pos):
@@ -183,7 +444,14 @@ class Tilemap:
             asset = self.game.assets[tile_type]
             return asset.img() if hasattr(asset, 'img') else asset[variant]
 
+    def _is_animated(self, tile_type):
+        assets = self.game.asset_manager.assets if self.env else self.game.assets
+        return hasattr(assets[tile_type], 'img')
+
     def render(self, surf, offset=(0, 0), zoom=10):
+        # Screen rects of animated tiles, for callers doing partial display updates
+        animated_rects = []
+
         # Render offgrid tiles (keep original logic for these)
         for tile in self.offgrid_tiles:
             if tile[TYPE] == 'spikes' and ROTATION in tile:
@@ -242,9 +510,13 @@ class Tilemap:
                 else:
                     img = self._get_image(base_type, tile[VARIANT])
                 
-                surf.blit(img, (x_pos, y_pos))
+                rect = surf.blit(img, (x_pos, y_pos))
+                if self._is_animated(base_type):
+                    animated_rects.append(rect)
                 processed_tiles.add(loc)
 
+        return animated_rects
+
     def render_ai(self, surf, offset=(0, 0), player_pos=None, finish_pos=None, distance=None):
         tile_colors = {
             'spikes': (255, 0, 0),       # Red - dangerous
@@ -330,4 +602,18 @@ class Tilemap:
                 font = pygame.font.SysFont(None, 24)
                 text = font.render(f"Dist: {distance}", True, (255, 255, 255))
                 surf.blit(text, ((x1 + x2) // 2, (y1 + y2) // 2))
-    
\ No newline at end of file
+    
+
+
+def write_map(path, map_data, compile=True):
+    # Touches only the snapshot and the files, so it is safe on a worker
+    # thread. The file extension picks JSON or the binary format. The map
+    # is saved once its file is written; a sidecar that cannot be baked is
+    # returned as a warning (the game then processes the map on load).
+    save_map_data(path, map_data)
+    if compile:
+        try:
+            Tilemap(None, TILE_SIZE, env=False).compile(path)
+        except Exception as error:
+            return error
+    return None
@@ -1,24 +1,30 @@
+import hashlib
+import os
+import struct
+import tempfile
+import zlib
 from pathlib import Path
 import pygame
 from scripts.constants import (
     BASE_IMG_PATH, FONT, DISPLAY_SIZE, calculate_ui_constants, 
-    SOUND_EXTENSIONS, DEFAULT_REMOVE_COLOR, DEFAULT_SOUND_VOLUME, 
-    MIN_FONT_SIZE, MAX_FONT_SIZE, REFERENCE_SIZE
+    DEFAULT_REMOVE_COLOR, DEFAULT_SOUND_VOLUME, 
+    MIN_FONT_SIZE, MAX_FONT_SIZE, REFERENCE_SIZE,
+    IMAGE_CACHE_ENABLED, IMAGE_CACHE_DIR, MENU_MUSIC_PATH, MENU_MUSIC_VOLUME,
+    MAP_EXTENSIONS
 )
+from scripts.audio import audio, sound_bank
+
+IMAGE_CACHE_MAGIC = b'AIMG'
+IMAGE_CACHE_HEADER = struct.Struct('<4sII')
 
 def get_distance_to_finish(self):
         # Fix: Call rect() as a method, not access as property
         player_rect = self.player.rect()
         player_pos = (player_rect.centerx // self.tilemap.tile_size, player_rect.centery // self.tilemap.tile_size)
         
-        finish_tile = None
-        for loc, tile in self.tilemap.tilemap.items():
-            if tile['type'].startswith('finish'):
-                finish_tile = tile
-                break
+        finish_pos = self.tilemap.finish_location()
         
-        if finish_tile is not None:
-            finish_pos = (finish_tile['pos'][0], finish_tile['pos'][1])
+        if finish_pos is not None:
             # Manhattan distance
             distance = abs(player_pos[0] - finish_pos[0]) + abs(player_pos[1] - finish_pos[1])
             # For Euclidean, use: math.sqrt((player_pos[0] - finish_pos[0])**2 + (player_pos[1] - finish_pos[1])**2)
@@ -27,46 +33,91 @@ def get_distance_to_finish(self):
         # Return default values if no finish tile found
         return None, player_pos, None
 
-def load_image(path, scale=None, remove_color=DEFAULT_REMOVE_COLOR):
+def image_cache_path(img_path, scale=None, remove_color=DEFAULT_REMOVE_COLOR):
+    # Keyed by source identity and every parameter that changes the pixels
+    stat = img_path.stat()
+    size = None if scale is None else (int(scale[0]), int(scale[1]))
+    key = f"{img_path.as_posix()}|{stat.st_mtime_ns}|{stat.st_size}|{size}|{remove_color}"
+    return Path(IMAGE_CACHE_DIR) / (hashlib.sha1(key.encode()).hexdigest() + '.bin')
+
+def read_cached_image(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            magic, width, height = IMAGE_CACHE_HEADER.unpack(f.read(IMAGE_CACHE_HEADER.size))
+            pixels = zlib.decompress(f.read())
+    except (OSError, struct.error, zlib.error):
+        return None
+    if magic != IMAGE_CACHE_MAGIC or len(pixels) != width * height * 3:
+        return None
+    return pygame.image.frombuffer(pixels, (width, height), 'RGB')
+
+def write_cached_image(cache_path, img):
+    # Unique temp name, so loaders writing the same entry cannot collide
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix='.tmp')
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(IMAGE_CACHE_HEADER.pack(IMAGE_CACHE_MAGIC, *img.get_size()))
+            f.write(zlib.compress(pygame.image.tobytes(img, 'RGB'), 1))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def decode_image(path, scale=None, remove_color=DEFAULT_REMOVE_COLOR):
+    # Decode and scale only; safe to run on worker threads. The result still
+    # needs finish_image() on the main thread before it is blitted
     img_path = Path(BASE_IMG_PATH) / path
-    img = pygame.image.load(str(img_path)).convert()
+    cache_path = image_cache_path(img_path, scale, remove_color) if IMAGE_CACHE_ENABLED else None
+    img = read_cached_image(cache_path) if cache_path else None
+    if img is None:
+        img = pygame.image.load(str(img_path))
+        if scale is not None:
+            img = pygame.transform.scale(img, scale)
+        if cache_path:
+            write_cached_image(cache_path, img)
+    return img
+
+def finish_image(img, remove_color=DEFAULT_REMOVE_COLOR):
+    img = img.convert()
     if remove_color is not None:
         img.set_colorkey(remove_color)
-    if scale is not None:
-        img = pygame.transform.scale(img, scale)
     return img
 
-def load_images(path, scale=None, remove_color=DEFAULT_REMOVE_COLOR):
+def load_image(path, scale=None, remove_color=DEFAULT_REMOVE_COLOR):
+    return finish_image(decode_image(path, scale, remove_color), remove_color)
+
+def list_images(path):
     dir_path = Path(BASE_IMG_PATH) / path
-    images = []
-    for img_path in sorted(dir_path.iterdir()):
-        if img_path.suffix.lower() in ('.png', '.jpg', '.jpeg', '.bmp'):
-            relative_path = img_path.relative_to(BASE_IMG_PATH)
-            images.append(load_image(str(relative_path), scale, remove_color))
-    return images
+    return [
+        str(img_path.relative_to(BASE_IMG_PATH))
+        for img_path in sorted(dir_path.iterdir())
+        if img_path.suffix.lower() in ('.png', '.jpg', '.jpeg', '.bmp')
+    ]
+
+def load_images(path, scale=None, remove_color=DEFAULT_REMOVE_COLOR):
+    return [load_image(img_path, scale, remove_color) for img_path in list_images(path)]
 
 def load_sound(path, volume=DEFAULT_SOUND_VOLUME):
-    sound_path = Path('data') / 'sfx' / path
-    sound = pygame.mixer.Sound(str(sound_path))
-    sound.set_volume(volume)
-    return sound
+    # Shared through the sound bank, so each file is decoded once per process
+    return sound_bank.sound(path, volume)
 
 def load_sounds(path, volume=DEFAULT_SOUND_VOLUME):
-    dir_path = Path('data') / 'sfx' / path
-    sounds = []
-    for snd_path in sorted(dir_path.iterdir()):
-        if snd_path.suffix.lower() in SOUND_EXTENSIONS:
-            relative_path = snd_path.relative_to(Path('data') / 'sfx')
-            sound = load_sound(str(relative_path), volume)
-            sounds.append(sound)
-    return sounds
+    return sound_bank.folder(path, volume)
 
 def find_next_numeric_filename(directory, extension='.json'):
     dir_path = Path(directory)
+    # Map ids are shared between the JSON and binary formats
+    suffixes = MAP_EXTENSIONS if extension in MAP_EXTENSIONS else (extension,)
     numeric_names = [
         int(f.stem)
         for f in dir_path.iterdir()
-        if f.is_file() and f.stem.isdigit() and f.suffix == extension
+        if f.is_file() and f.stem.isdigit() and f.suffix in suffixes
     ]
     next_number = max(numeric_names, default=-1) + 1
     return f"{next_number}{extension}"
@@ -191,12 +242,20 @@ class Button:
         self.selected = False
         self.previously_selected = False
         self.bg_color = bg_color
+        self.image = None
         self.hover_sounds = load_sounds('hover', volume=0.04)
         self.click_sounds = load_sounds('click', volume=0.15)
         self.border_radius = max(6, int(rect.height * 0.1))
         display_height = pygame.display.get_surface().get_height()
         self.shadow_offset = max(2, int(4 * (display_height / 1080)))
 
+    def set_image(self, image):
+        # Scaled once to fit inside the button, keeping its aspect ratio
+        inner_w, inner_h = self.rect.width - 8, self.rect.height - 8
+        scale = min(inner_w / image.get_width(), inner_h / image.get_height())
+        size = (max(1, int(image.get_width() * scale)), max(1, int(image.get_height() * scale)))
+        self.image = pygame.transform.smoothscale(image, size)
+
     def is_hovered(self, mouse_pos):
         return self.rect.collidepoint(mouse_pos)
 
@@ -236,6 +295,8 @@ class Button:
         button_surface = pygame.Surface((self.rect.width, self.rect.height), pygame.SRCALPHA)
         button_surface.fill(button_color)
         surface.blit(button_surface, (self.rect.x, self.rect.y))
+        if self.image is not None:
+            surface.blit(self.image, self.image.get_rect(center=self.rect.center))
         # Text with shadow
         text_shadow = self.font.render(self.text, True, (0, 0, 0, 180))
         text_surf = self.font.render(self.text, True, (255, 255, 255))
@@ -277,14 +338,11 @@ class MenuScreen:
         self.enabled = False
         self.title = title
         self.buttons = []
-        self.music_path = 'data/sfx/music/menu.ogg'
+        self.music_path = MENU_MUSIC_PATH
         self.play_music()
 
     def play_music(self):
-        pygame.mixer.init()
-        pygame.mixer.music.load(str(self.music_path))
-        pygame.mixer.music.set_volume(0.2) 
-        pygame.mixer.music.play(-1) 
+        audio.play_music(self.music_path, MENU_MUSIC_VOLUME)
 
     def enable(self):
         self.enabled = True
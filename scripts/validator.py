@@ -0,0 +1,349 @@
+import heapq
+import sys
+import time
+from scripts.constants import *
+from scripts.mapcompile import SPAWNER_IDS
+from scripts.mapformat import load_map_data
+from scripts.player import Player
+from scripts.tilemap import Tilemap
+
+# Completability check: a search over held-input macros from the spawner,
+# driven by the game's own Player physics so the answer matches play. States
+# are deduplicated on a quantized key, which keeps the search to roughly one
+# state per reachable spot and speed. Each kept state is the exact one first
+# reached, so the witness replays to the finish frame for frame.
+
+# Every combination of direction and jump, held for VALIDATOR_MACRO_FRAMES.
+# Holding jump across macros keeps a jump going, so short and long jumps
+# are both covered. Each jump macro directly follows the same steering
+# without jump, which the search relies on to skip it (see validate_tilemap).
+MACROS = [
+    {'left': left, 'right': right, 'jump': jump}
+    for left, right in ((False, False), (True, False), (False, True))
+    for jump in (False, True)
+]
+
+
+class _Silent:
+    # Stands in for animations and sounds; the search never draws or plays
+    def copy(self):
+        return self
+
+    def update(self):
+        pass
+
+    def play(self):
+        pass
+
+
+class _SilentAssets(dict):
+    def __missing__(self, key):
+        return _Silent()
+
+
+class HeadlessGame:
+    def __init__(self):
+        self.assets = _SilentAssets()
+        self.sfx = _SilentAssets()
+
+
+class CollisionCache:
+    # The tilemap as Player.update sees it, memoized per cell. Tiles never
+    # change during a search, and the same few hundred cells are queried
+    # millions of times.
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+        self.tile_size = tilemap.tile_size
+        self.physics = {}
+        self.interactive = {}
+
+    def _cell(self, pos):
+        return int(pos[0] // self.tile_size), int(pos[1] // self.tile_size)
+
+    def physics_rects_around(self, pos):
+        cell = self._cell(pos)
+        rects = self.physics.get(cell)
+        if rects is None:
+            rects = self.physics[cell] = self.tilemap.physics_rects_around(pos)
+        return rects
+
+    def interactive_rects_around(self, pos):
+        cell = self._cell(pos)
+        rects = self.interactive.get(cell)
+        if rects is None:
+            rects = self.interactive[cell] = self.tilemap.interactive_rects_around(pos)
+        return rects
+
+    def is_below_map(self, entity_pos, tiles_threshold=2):
+        return self.tilemap.is_below_map(entity_pos, tiles_threshold)
+
+
+def _snapshot(player):
+    state = dict(player.__dict__)
+    state['pos'] = list(player.pos)
+    state['velocity'] = list(player.velocity)
+    return state
+
+
+def _restore(state):
+    player = Player.__new__(Player)
+    player.__dict__.update(state)
+    player.pos = list(state['pos'])
+    player.velocity = list(state['velocity'])
+    return player
+
+
+def _state_key(player):
+    # Coarse on purpose: finer keys multiply the states many times over
+    # without finding more of the map. In the air only rising or falling is
+    # kept of the vertical speed, and a held jump is implied by rising since
+    # releasing it cuts the rise.
+    position, speed = TILE_SIZE / VALIDATOR_POSITION_STEPS, TILE_SIZE / VALIDATOR_SPEED_STEPS
+    if player.grounded:
+        vertical, held = round(player.velocity[1] / speed), not player.jump_available
+    else:
+        vertical, held = player.velocity[1] < 0, None
+    return (
+        int(player.pos[0] // position), int(player.pos[1] // position),
+        round(player.velocity[0] / speed), vertical,
+        player.grounded, held, player.walljump_setback_timer > 0,
+    )
+
+
+def _floor_cell(player):
+    # The cell a grounded player stands in
+    rect = player.rect()
+    return int(rect.centerx // TILE_SIZE), int((rect.bottom - 1) // TILE_SIZE)
+
+
+def standable_cells(tilemap):
+    # Free cells resting on a solid tile; where a player could stand
+    cells = set()
+    for tile in tilemap.tilemap.values():
+        if tile[TYPE] in PHYSICS_TILES:
+            above = f"{tile[POS][0]};{tile[POS][1] - 1}"
+            if above not in tilemap.tilemap:
+                cells.add((tile[POS][0], tile[POS][1] - 1))
+    return cells
+
+
+class ValidationReport:
+    def __init__(self):
+        self.errors = []
+        self.reachable = False
+        # Macros (input dict, frames) from the spawner to the finish
+        self.witness = None
+        # Standable cells the search never reached and reached cells from
+        # which the finish can no longer be reached; both only filled when
+        # the search completed, as a partial one leaves most cells unvisited
+        self.dead_zones = []
+        self.traps = []
+        self.states = 0
+        self.complete = True
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return not self.errors and self.reachable
+
+    def summary(self):
+        if self.errors:
+            return '; '.join(self.errors)
+        if not self.reachable:
+            # States are merged on a coarse key, so even a complete search
+            # has not tried every input; only the static checks are certain
+            return "finish not found by the search" if self.complete else "finish not reached within the search budget"
+        return f"finish reachable in {len(self.witness)} moves"
+
+
+def _static_checks(tilemap, report):
+    if not tilemap.spawners:
+        report.errors.append("no spawner")
+    elif len(tilemap.spawners) > 1:
+        report.errors.append(f"{len(tilemap.spawners)} spawners")
+    if tilemap.finish_location() is None:
+        report.errors.append("no finish")
+
+
+def map_problems(map_data):
+    # Checks cheap enough to run on the main thread when the editor saves:
+    # one spawner, a finish, and what an idle player falls onto from the
+    # spawner (solid ground or the finish itself). map_data is a saved
+    # snapshot and is left untouched.
+    tiles = map_data[TILEMAP]
+    grid_spawners = [tile for tile in tiles.values() if (tile[TYPE], tile[VARIANT]) in SPAWNER_IDS]
+    offgrid_spawners = [tile for tile in map_data[OFFGRID] if (tile[TYPE], tile[VARIANT]) in SPAWNER_IDS]
+    spawners = grid_spawners + offgrid_spawners
+    problems = []
+    if not spawners:
+        problems.append("no spawner")
+    elif len(spawners) > 1:
+        problems.append(f"{len(spawners)} spawners")
+    if not any(tile[TYPE].startswith('finish') for tile in tiles.values()):
+        problems.append("no finish")
+    if len(spawners) == 1:
+        x, y = spawners[0][POS]
+        if offgrid_spawners and isinstance(x, int):
+            # Integer offgrid spawners are in pixels (see _handle_spawners)
+            x, y = x // TILE_SIZE, y // TILE_SIZE
+        x, y = int(x), int(y)
+        lowest_y = max((tile[POS][1] for tile in tiles.values()), default=y)
+        for below in range(y + 1, lowest_y + 1):
+            tile = tiles.get(f"{x};{below}")
+            base_type = tile[TYPE].split()[0] if tile is not None else None
+            if base_type in PHYSICS_TILES or base_type == 'finish':
+                break
+            if base_type in ('spikes', 'kill'):
+                problems.append("spawner over a hazard")
+                break
+        else:
+            problems.append("spawner falls out of the map")
+    return problems
+
+
+def validate_tilemap(tilemap, max_states=VALIDATOR_MAX_STATES, time_limit=VALIDATOR_TIME_LIMIT):
+    # tilemap is processed for play: spawners extracted, e.g. by load_data
+    started = time.perf_counter()
+    report = ValidationReport()
+    _static_checks(tilemap, report)
+    if report.errors:
+        return report
+
+    game = HeadlessGame()
+    collisions = CollisionCache(tilemap)
+    spawn = tilemap.spawners[0][POS]
+    start = Player(game, list(spawn), PLAYERS_SIZE, game.sfx)
+    idle = MACROS[0]
+    for _ in range(VALIDATOR_MACRO_FRAMES):
+        start.update(collisions, idle, 0)
+    if start.death:
+        report.errors.append("spawner over a hazard")
+        return report
+
+    # Best first towards the finish, counting macros taken plus a weighted
+    # estimate of those left, so the finish turns up early even on wide
+    # maps; the rest of the budget explores everything else for dead zones
+    finish = tilemap.finish_location()
+    finish_px = ((finish[0] + 0.5) * TILE_SIZE, (finish[1] + 0.5) * TILE_SIZE)
+    macro_reach = MAX_X_SPEED * VALIDATOR_MACRO_FRAMES
+
+    def estimate(player):
+        rect = player.rect()
+        distance = abs(rect.centerx - finish_px[0]) + abs(rect.centery - finish_px[1])
+        return VALIDATOR_GREED * distance / macro_reach
+
+    states = [_snapshot(start)]
+    parents = [(-1, None)]
+    depths = [0]
+    children = [[]]
+    seen = {_state_key(start): 0}
+    floors = {_floor_cell(start)} if start.grounded else set()
+    grounded_cells = [_floor_cell(start) if start.grounded else None]
+    goals = []
+    queue = [(estimate(start), 0)]
+    while queue:
+        if len(states) >= max_states or time.perf_counter() - started > time_limit:
+            report.complete = False
+            break
+        _, index = heapq.heappop(queue)
+        state = states[index]
+        # While falling, jump only matters against a wall: a held jump
+        # cannot start a wall jump, and a fresh one without a wall just
+        # falls faster. So jump is only tried where the same steering
+        # without it touched a wall.
+        falling = not state['grounded'] and state['velocity'][1] >= 0
+        walled = False
+        for macro_id, keys in enumerate(MACROS):
+            if keys['jump'] and falling and not (walled and state['jump_available']):
+                continue
+            player = _restore(state)
+            walled = False
+            for _ in range(VALIDATOR_MACRO_FRAMES):
+                player.update(collisions, keys, 0)
+                walled = walled or player.collisions['left'] or player.collisions['right']
+                if player.death or player.finishLevel:
+                    break
+            if player.death:
+                continue
+            key = _state_key(player)
+            child = seen.get(key)
+            if child is None:
+                child = len(states)
+                seen[key] = child
+                states.append(_snapshot(player))
+                parents.append((index, macro_id))
+                depths.append(depths[index] + 1)
+                children.append([])
+                cell = _floor_cell(player) if player.grounded else None
+                grounded_cells.append(cell)
+                if cell is not None:
+                    floors.add(cell)
+                if player.finishLevel:
+                    goals.append(child)
+                else:
+                    heapq.heappush(queue, (depths[child] + estimate(player), child))
+            children[index].append(child)
+
+    report.states = len(states)
+    if report.complete:
+        report.dead_zones = sorted(standable_cells(tilemap) - floors)
+    if goals:
+        report.reachable = True
+        witness = []
+        node = goals[0]
+        while parents[node][0] >= 0:
+            node, macro_id = parents[node]
+            witness.append((MACROS[macro_id], VALIDATOR_MACRO_FRAMES))
+        report.witness = witness[::-1]
+        if report.complete:
+            report.traps = _traps(children, grounded_cells, goals)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _traps(children, grounded_cells, goals):
+    # Cells only stood on in states that cannot lead to the finish
+    reverse = [[] for _ in children]
+    for parent, targets in enumerate(children):
+        for child in targets:
+            reverse[child].append(parent)
+    can_finish = set(goals)
+    stack = list(goals)
+    while stack:
+        for parent in reverse[stack.pop()]:
+            if parent not in can_finish:
+                can_finish.add(parent)
+                stack.append(parent)
+    good_cells = {grounded_cells[i] for i in can_finish if grounded_cells[i] is not None}
+    return sorted({
+        cell for i, cell in enumerate(grounded_cells)
+        if cell is not None and cell not in good_cells
+    })
+
+
+def validate_map_data(map_data, **limits):
+    # Consumes map_data (a snapshot or freshly loaded data)
+    tilemap = Tilemap(None, TILE_SIZE, env=False)
+    tilemap.load_data(map_data)
+    return validate_tilemap(tilemap, **limits)
+
+
+def validate_map(path, **limits):
+    return validate_map_data(load_map_data(path), **limits)
+
+
+if __name__ == '__main__':
+    import os
+    paths = sys.argv[1:] or sorted(
+        os.path.join(MAPS_DIR, name) for name in os.listdir(MAPS_DIR) if name.endswith(MAP_EXTENSIONS)
+    )
+    failed = False
+    for path in paths:
+        report = validate_map(path)
+        failed |= not report.ok
+        if report.complete:
+            cells = f"{len(report.dead_zones)} unreached floor cells, {len(report.traps)} trap cells"
+        else:
+            cells = "partial search, dead zones and traps unexplored"
+        print(f"{path}: {report.summary()} ({report.states} states, {report.seconds:.2f}s, {cells})")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,49 @@
+from scripts.bulkedit import Clipboard
+from scripts.constants import TILE_SIZE
+from scripts.editor import Editor
+from scripts.edithistory import EditHistory
+from scripts.lodrender import LODRenderer
+from scripts.tilemap import Tilemap
+
+
+def tile(tile_type, x, y):
+    return {'type': tile_type, 'variant': 0, 'pos': [x, y]}
+
+
+def bare_editor(tiles):
+    # Just the state the bulk edits touch, without a window or assets
+    editor = Editor.__new__(Editor)
+    editor.tilemap = Tilemap(None, TILE_SIZE, env=False)
+    editor.tilemap.tilemap = {f"{t['pos'][0]};{t['pos'][1]}": t for t in tiles}
+    editor.history = EditHistory()
+    editor.live_autotile = False
+    editor.lod = LODRenderer({})
+    editor.tile_list, editor.tile_group, editor.tile_variant = ['stone'], 0, 0
+    editor.rebuild_special_index()
+    return editor
+
+
+def test_fill_over_half_a_finish_replaces_the_whole_block():
+    editor = bare_editor([tile('finish up', 0, 0), tile('finish down', 0, 1)])
+    editor.fill_rect((0, 0), (2, 0))
+    tiles = editor.tilemap.tilemap
+    assert [tiles[f"{x};0"]['type'] for x in range(3)] == ['stone'] * 3
+    assert '0;1' not in tiles
+    assert not editor.special_locs['finish']
+
+
+def test_erase_over_half_a_portal_removes_both_halves_in_one_undo():
+    editor = bare_editor([tile('portal up', 4, 2), tile('portal down', 4, 3), tile('stone', 5, 3)])
+    editor.fill_rect((4, 3), (5, 3), erase=True)
+    assert editor.tilemap.tilemap == {}
+    assert not editor.special_locs['portal']
+
+    editor.undo()
+    assert sorted(editor.tilemap.tilemap) == ['4;2', '4;3', '5;3']
+    assert editor.special_locs['portal'] == {'4;2', '4;3'}
+
+
+def test_copy_leaves_behind_a_finish_cut_in_half():
+    editor = bare_editor([tile('finish up', 0, 0), tile('finish down', 0, 1), tile('stone', 1, 1)])
+    clipboard = Clipboard(editor.tilemap.tilemap, [], (0, 1, 1, 1))
+    assert [state[0] for _, _, state in clipboard.cells] == ['stone']
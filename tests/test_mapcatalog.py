@@ -0,0 +1,26 @@
+from scripts.constants import TILEMAP, OFFGRID, LOWEST_Y, BINARY_MAP_EXTENSION
+from scripts.mapcatalog import MapCatalog
+from scripts.mapformat import save_map_data, find_map_path
+
+EMPTY_MAP = {TILEMAP: {}, OFFGRID: [], LOWEST_Y: 0}
+
+
+def make_maps(directory, names):
+    for name in names:
+        save_map_data(str(directory / name), EMPTY_MAP)
+
+
+def test_map_in_two_formats_is_listed_once(tmp_path):
+    make_maps(tmp_path, ['0.json', '1.json', '1' + BINARY_MAP_EXTENSION, '2.json'])
+    catalog = MapCatalog(str(tmp_path))
+    assert catalog.filenames() == ['0.json', '1.json', '2.json']
+    # The listed copy is the one the game resolves the id to
+    assert catalog.maps()[1].path == find_map_path(1, str(tmp_path))
+
+
+def test_next_map_skips_other_formats_of_the_same_id(tmp_path):
+    make_maps(tmp_path, ['0.json', '1.json', '1' + BINARY_MAP_EXTENSION, '2.json'])
+    catalog = MapCatalog(str(tmp_path))
+    assert catalog.next_map(str(tmp_path / '1.json')).filename == '2.json'
+    assert catalog.next_map(str(tmp_path / ('1' + BINARY_MAP_EXTENSION))).filename == '2.json'
+    assert catalog.is_last_map(str(tmp_path / '2.json'))